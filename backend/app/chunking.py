@@ -0,0 +1,136 @@
+import os
+import re
+import threading
+from typing import Iterable, Iterator, Optional
+
+# Token budget for the page text of one LLM call (prompt overhead excluded).
+# 0 disables packing: one chunk per page, as before.
+LLM_CHUNK_TOKENS = int(os.getenv("LLM_CHUNK_TOKENS", "3000"))
+TIKTOKEN_ENCODING = "o200k_base"
+# Rough characters per token when tiktoken's encoding cannot be loaded
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            _encoding_loaded = True
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+            except Exception as e:
+                # tiktoken downloads its BPE file on first use; stay usable offline
+                print(f"[WARN] tiktoken unavailable ({e}), estimating tokens")
+        return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def page_marker(page_number: int | None) -> str:
+    return f"[Page {page_number}]"
+
+
+def _split_oversized(text: str, budget: int) -> list[str]:
+    """Split on sentence boundaries; a single over-long sentence is split on words."""
+    pieces: list[str] = []
+    current: list[str] = []
+    current_tokens = 0
+    for sentence in _SENTENCE_END.split(text):
+        sentence_tokens = count_tokens(sentence)
+        if sentence_tokens > budget:
+            words = sentence.split()
+            step = max(1, len(words) * budget // sentence_tokens)
+            parts = [" ".join(words[i:i + step])
+                     for i in range(0, len(words), step)]
+        else:
+            parts = [sentence]
+        for part in parts:
+            # +1 for the joining space
+            part_tokens = count_tokens(part) + 1
+            if current and current_tokens + part_tokens > budget:
+                pieces.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def build_chunks(pages: list[dict], budget: int = LLM_CHUNK_TOKENS) -> list[dict]:
+    """Pack consecutive pages into token-budgeted chunks.
+
+    ``pages`` are ``{"page-number": int, "text": str}``. Each chunk is
+    ``{"text", "page-numbers", "segments", "token-count"}`` where
+    ``segments`` keeps the per-page slice of text, so results can be mapped
+    back to the pages they came from. Every page segment in ``text`` is
+    preceded by a ``[Page N]`` marker.
+    """
+    return list(iter_chunks(pages, budget))
+
+
+def iter_chunks(pages: Iterable[dict], budget: int = LLM_CHUNK_TOKENS) -> Iterator[dict]:
+    """Streaming build_chunks: each chunk is yielded as soon as it is full,
+    pulling no more pages than that chunk needs."""
+    segments: list[dict] = []
+    used = 0
+
+    def flush() -> Optional[dict]:
+        nonlocal segments, used
+        chunk = None
+        if segments:
+            chunk = {
+                "text": "\n\n".join(f"{page_marker(s['page-number'])}\n{s['text']}" for s in segments),
+                "page-numbers": sorted({s["page-number"] for s in segments}),
+                "segments": segments,
+                "token-count": used,
+            }
+        segments, used = [], 0
+        return chunk
+
+    for page in pages:
+        text = page["text"]
+        tokens = count_tokens(text) + count_tokens(page_marker(page["page-number"]))
+        if budget <= 0:
+            segments.append({"page-number": page["page-number"], "text": text})
+            used = tokens
+            yield flush()
+            continue
+        if tokens > budget:
+            if chunk := flush():
+                yield chunk
+            marker_tokens = count_tokens(page_marker(page["page-number"]))
+            for piece in _split_oversized(text, budget - marker_tokens):
+                segments.append(
+                    {"page-number": page["page-number"], "text": piece})
+                used = count_tokens(piece) + marker_tokens
+                yield flush()
+            continue
+        if used + tokens > budget:
+            if chunk := flush():
+                yield chunk
+        segments.append({"page-number": page["page-number"], "text": text})
+        used += tokens
+    if chunk := flush():
+        yield chunk
+
+
+def chunk_context(chunk: dict, page_numbers: list[int] | None = None) -> str:
+    """Text of the chunk restricted to ``page_numbers`` (all pages if empty)."""
+    wanted = set(page_numbers or []) & set(chunk["page-numbers"])
+    if not wanted or wanted == set(chunk["page-numbers"]):
+        return chunk["text"]
+    return "\n\n".join(f"{page_marker(s['page-number'])}\n{s['text']}"
+                       for s in chunk["segments"] if s["page-number"] in wanted)
@@ -0,0 +1,62 @@
+from pydantic import SecretStr
+from langchain_openai import ChatOpenAI
+from dotenv import load_dotenv
+from app.llm_runner import LLM_MAX_CONCURRENCY
+import httpx
+import os
+import threading
+
+load_dotenv()
+
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY") or ""
+OPENAI_API_BASE = "https://openrouter.ai/api/v1"
+OPENROUTER_MODEL = "openai/gpt-5-nano"
+LLM_HTTP_TIMEOUT_SECONDS = float(os.getenv("LLM_HTTP_TIMEOUT_SECONDS", "120"))
+# Idle keep-alive connections are closed after this long
+LLM_HTTP_KEEPALIVE_SECONDS = float(os.getenv("LLM_HTTP_KEEPALIVE_SECONDS", "60"))
+
+_lock = threading.Lock()
+_http_client: httpx.Client | None = None
+_chat_model: ChatOpenAI | None = None
+
+
+def get_http_client() -> httpx.Client:
+    """Process-wide HTTP client: one connection pool, sized to the LLM
+    concurrency limit, so TLS sessions are reused across calls and threads."""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                timeout=LLM_HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY,
+                                    max_keepalive_connections=LLM_MAX_CONCURRENCY,
+                                    keepalive_expiry=LLM_HTTP_KEEPALIVE_SECONDS),
+            )
+        return _http_client
+
+
+def get_chat_model() -> ChatOpenAI:
+    """The one ChatOpenAI client; callers needing other sampling settings
+    ``.bind()`` them instead of building a second client."""
+    global _chat_model
+    http_client = get_http_client()
+    with _lock:
+        if _chat_model is None:
+            _chat_model = ChatOpenAI(
+                model=OPENROUTER_MODEL,
+                max_retries=2,
+                api_key=SecretStr(OPENROUTER_API_KEY),
+                base_url=OPENAI_API_BASE,
+                temperature=0.4,
+                http_client=http_client,
+            )
+        return _chat_model
+
+
+def close_clients() -> None:
+    global _http_client, _chat_model
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _chat_model = None
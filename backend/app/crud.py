@@ -1,13 +1,26 @@
-from sqlmodel import Session, select
+from sqlmodel import Session, SQLModel, col, select
+from sqlalchemy import and_, delete, exists, func, or_, update, text as sql_text
+from sqlalchemy.dialects.postgresql import insert
 from typing import Optional, List
-from app.models import Users, Job, ActionableLine, JobState, Upload, ExtractedContent
-from app.database import get_session
+from app.models import Users, Job, ActionableLine, JobState, Upload, ExtractedContent, SummarizedContent
+from app.database import session_scope
 from app.ocr import OCR_Manager
+from app.normalize import normalize_page
 from app.llm import *
+from datetime import datetime, timedelta, timezone
+from app.llm_runner import LLM_MAX_CONCURRENCY, imap_bounded
+from typing import Callable, Iterable, Iterator, TypeVar
+import hashlib
+import io
 import json
+import os
 
-# Singleton session
-session: Session = next(get_session())
+M = TypeVar("M", bound=SQLModel)
+
+# Bulk inserts of at least this many rows are loaded with COPY (Postgres only)
+DB_COPY_THRESHOLD = int(os.getenv("DB_COPY_THRESHOLD", "500"))
+# ExtractedContent rows written per transaction while pages stream in
+PAGE_WRITE_BATCH = int(os.getenv("PAGE_WRITE_BATCH", "16"))
 
 # ------------------------------
 # Create or Update a Users
@@ -15,45 +28,199 @@ session: Session = next(get_session())
 
 
 def upsert_user(email: str, full_name: Optional[str] = None) -> Users:
-    stmt = select(Users).where(Users.email == email)
-    user = session.exec(stmt).first()
+    with session_scope() as session:
+        stmt = select(Users).where(Users.email == email)
+        user = session.exec(stmt).first()
 
-    if user:
-        user.full_name = full_name or user.full_name
-    else:
-        user = Users(email=email, full_name=full_name)
-        session.add(user)
+        if user:
+            user.full_name = full_name or user.full_name
+        else:
+            user = Users(email=email, full_name=full_name)
+            session.add(user)
 
-    session.commit()
-    session.refresh(user)
-    return user
+        session.commit()
+        session.refresh(user)
+        return user
 
 
 # ------------------------------
-# Create a Job (always PENDING)
+# Create a Job (PENDING unless told otherwise)
 # ------------------------------
-def create_job(user_id: int) -> Job:
-    job = Job(user_id=user_id, status=JobState.PENDING)
-    session.add(job)
-    session.commit()
-    session.refresh(job)
-    return job
+def create_job(user_id: int, status: JobState = JobState.PENDING) -> Job:
+    with session_scope() as session:
+        job = Job(user_id=user_id, status=status)
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        return job
 
 
 # ------------------------------
 # Complete a Job (mark as FINISHED)
 # ------------------------------
 def complete_job(job_id: int) -> Job:
-    stmt = select(Job).where(Job.id == job_id)
-    job = session.exec(stmt).first()
+    with session_scope() as session:
+        stmt = select(Job).where(Job.id == job_id)
+        job = session.exec(stmt).first()
+
+        if not job:
+            raise ValueError(f"Job with id {job_id} not found")
+
+        job.status = JobState.FINISHED
+        job.finished_at = datetime.now(timezone.utc)
+        session.commit()
+        session.refresh(job)
+        return job
 
-    if not job:
-        raise ValueError(f"Job with id {job_id} not found")
 
-    job.status = JobState.FINISHED
-    session.commit()
-    session.refresh(job)
-    return job
+# ------------------------------
+# Move a Job to another state (RUNNING / PARTIAL / FAILED ...)
+# ------------------------------
+def set_job_status(job_id: int, status: JobState, error: Optional[str] = None) -> Job:
+    with session_scope() as session:
+        job = session.get(Job, job_id)
+
+        if not job:
+            raise ValueError(f"Job with id {job_id} not found")
+
+        job.status = status
+        if status == JobState.RUNNING:
+            job.started_at = datetime.now(timezone.utc)
+        elif status in (JobState.FINISHED, JobState.PARTIAL, JobState.FAILED):
+            job.finished_at = datetime.now(timezone.utc)
+        if error is not None:
+            job.error = error
+        session.commit()
+        session.refresh(job)
+        return job
+
+
+# ------------------------------
+# Record per-page progress of a running Job
+# ------------------------------
+def update_job_progress(
+    job_id: int,
+    pages_done: Optional[int] = None,
+    pages_total: Optional[int] = None,
+    pages_failed: Optional[int] = None,
+    pages_reused: Optional[int] = None,
+    pages_routed: Optional[int] = None,
+    pages_skipped: Optional[int] = None,
+) -> Job:
+    with session_scope() as session:
+        job = session.get(Job, job_id)
+
+        if not job:
+            raise ValueError(f"Job with id {job_id} not found")
+
+        if pages_total is not None:
+            job.pages_total = pages_total
+        if pages_done is not None:
+            job.pages_done = pages_done
+        if pages_failed is not None:
+            job.pages_failed = pages_failed
+        if pages_reused is not None:
+            job.pages_reused = pages_reused
+        if pages_routed is not None:
+            job.pages_routed = pages_routed
+        if pages_skipped is not None:
+            job.pages_skipped = pages_skipped
+        session.commit()
+        session.refresh(job)
+        return job
+
+
+# ------------------------------
+# Work queue: lease-based claiming of Jobs across replicas
+# ------------------------------
+def claim_job(owner: str, lease_seconds: int, max_attempts: int) -> Optional[Job]:
+    """Lease the oldest runnable Job to ``owner``, or return None.
+
+    Runnable means PENDING, or RUNNING with an expired lease (its worker
+    died). ``FOR UPDATE SKIP LOCKED`` lets replicas claim concurrently
+    without blocking on, or double-claiming, each other's rows.
+    """
+    now = datetime.now(timezone.utc)
+    with session_scope() as session:
+        claimable = (select(Job.id)
+                     .where(or_(Job.status == JobState.PENDING,
+                                and_(Job.status == JobState.RUNNING,
+                                     col(Job.lease_expires_at) < now)),
+                            Job.attempts < max_attempts,
+                            # the upload row is written right after the job
+                            exists().where(Upload.job_id == Job.id))
+                     .order_by(Job.id)
+                     .limit(1)
+                     .with_for_update(skip_locked=True)
+                     .scalar_subquery())
+        job = session.scalars(
+            update(Job).where(Job.id == claimable).values(
+                status=JobState.RUNNING,
+                lease_owner=owner,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                heartbeat_at=now,
+                attempts=Job.attempts + 1,
+                started_at=now,
+                finished_at=None,
+            ).returning(Job).execution_options(populate_existing=True)
+        ).first()
+        session.commit()
+        if job:
+            session.refresh(job)
+        return job
+
+
+def heartbeat_job(job_id: int, owner: str, lease_seconds: int) -> bool:
+    """Extend the lease; False if ``owner`` no longer holds it."""
+    now = datetime.now(timezone.utc)
+    with session_scope() as session:
+        result = session.exec(
+            update(Job).where(Job.id == job_id, Job.lease_owner == owner,
+                              Job.status == JobState.RUNNING)
+            .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=lease_seconds)))
+        session.commit()
+        return bool(result.rowcount)
+
+
+def release_job(job_id: int, owner: str, expire: bool = False) -> None:
+    """Drop ``owner``'s lease; with ``expire`` the job is left for another worker."""
+    now = datetime.now(timezone.utc)
+    with session_scope() as session:
+        values: dict = {"lease_owner": None}
+        if expire:
+            values["lease_expires_at"] = now
+        session.exec(update(Job).where(Job.id == job_id, Job.lease_owner == owner)
+                     .values(**values))
+        session.commit()
+
+
+def fail_exhausted_jobs(max_attempts: int) -> int:
+    """Mark Jobs whose lease expired on their last attempt as FAILED."""
+    now = datetime.now(timezone.utc)
+    with session_scope() as session:
+        result = session.exec(
+            update(Job).where(Job.status == JobState.RUNNING,
+                              col(Job.lease_expires_at) < now,
+                              Job.attempts >= max_attempts)
+            .values(status=JobState.FAILED, finished_at=now, lease_owner=None,
+                    error=f"Lease expired after {max_attempts} attempts"))
+        session.commit()
+        return result.rowcount or 0
+
+
+def get_upload_for_job(job_id: int) -> Optional[Upload]:
+    with session_scope() as session:
+        return session.exec(select(Upload).where(Upload.job_id == job_id)
+                            .order_by(Upload.id)).first()
+
+
+def clear_upload_results(upload_id: int) -> int:
+    """Delete summaries left by an earlier, interrupted attempt."""
+    with session_scope() as session:
+        result = session.exec(delete(SummarizedContent).where(
+            SummarizedContent.upload_id == upload_id))
+        session.commit()
+        return result.rowcount or 0
 
 
 # ------------------------------
@@ -66,115 +233,338 @@ def insert_actionable_line(
     paraphrased_line: str,
     departments: List[str],
 ) -> ActionableLine:
-    line = ActionableLine(
-        upload_id=upload_id,
-        job_id=job_id,
-        content_id=content_id,
-        paraphrased_line=paraphrased_line,
-        departments=departments,
-    )
-    session.add(line)
-    session.commit()
-    session.refresh(line)
-    return line
+    with session_scope() as session:
+        line = ActionableLine(
+            upload_id=upload_id,
+            job_id=job_id,
+            content_id=content_id,
+            paraphrased_line=paraphrased_line,
+            departments=departments,
+        )
+        session.add(line)
+        session.commit()
+        session.refresh(line)
+        return line
 
 
 # ------------------------------
 # Create or Update Upload
 # ------------------------------
-def upsert_upload(job_id: int | None, file_path: str) -> Upload:
-    stmt = select(Upload).where(Upload.job_id ==
-                                job_id, Upload.file_path == file_path)
-    upload = session.exec(stmt).first()
+def upsert_upload(
+    job_id: int | None,
+    file_path: str,
+    original_filename: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    size_bytes: Optional[int] = None,
+) -> Upload:
+    with session_scope() as session:
+        stmt = select(Upload).where(Upload.job_id ==
+                                    job_id, Upload.file_path == file_path)
+        upload = session.exec(stmt).first()
+
+        if upload:
+            upload.file_path = file_path
+        else:
+            upload = Upload(job_id=job_id, file_path=file_path)
+            session.add(upload)
+        upload.original_filename = original_filename or upload.original_filename
+        upload.content_hash = content_hash or upload.content_hash
+        upload.size_bytes = size_bytes if size_bytes is not None else upload.size_bytes
+
+        session.commit()
+        session.refresh(upload)
+        return upload
 
-    if upload:
-        upload.file_path = file_path
-    else:
-        upload = Upload(job_id=job_id, file_path=file_path)
-        session.add(upload)
 
-    session.commit()
-    session.refresh(upload)
-    return upload
+# ------------------------------
+# Find a finished upload of the same file
+# ------------------------------
+def find_processed_upload(content_hash: str) -> Optional[Upload]:
+    with session_scope() as session:
+        stmt = (select(Upload)
+                .join(Job, Job.id == Upload.job_id)
+                .where(Upload.content_hash == content_hash,
+                       Upload.source_upload_id == None,  # noqa: E711
+                       Job.status == JobState.FINISHED)
+                .order_by(Upload.id.desc()))
+        return session.exec(stmt).first()
+
+
+# ------------------------------
+# Point a duplicate upload at the results of an earlier one and finish its Job
+# ------------------------------
+def link_duplicate_upload(job_id: int, upload_id: int, source_upload_id: int) -> Job:
+    with session_scope() as session:
+        job = session.get(Job, job_id)
+        upload = session.get(Upload, upload_id)
+        source = session.get(Upload, source_upload_id)
+        if not job or not upload or not source:
+            raise ValueError(
+                f"Job {job_id} or uploads {upload_id}/{source_upload_id} not found")
+
+        upload.source_upload_id = source.id
+        source_job = source.job
+        if source_job:
+            job.pages_total = source_job.pages_total
+            job.pages_done = source_job.pages_done
+            job.pages_failed = source_job.pages_failed
+            job.pages_reused = source_job.pages_done
+        now = datetime.now(timezone.utc)
+        job.status = JobState.FINISHED
+        job.started_at = now
+        job.finished_at = now
+        session.commit()
+        session.refresh(job)
+        return job
 
 
 # ------------------------------
 # Create or Update Extracted Content
 # ------------------------------
+def content_hash(text: str) -> str:
+    # same digest as the backfill migration in app.database
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# a page is identified by (upload_id, page_number, content_hash); on conflict
+# only a newly known extraction method is written
+_EXTRACTED_CONFLICT = ["upload_id", "page_number", "content_hash"]
+_EXTRACTED_UPDATE = ["extraction_method"]
+
+
 def upsert_extracted_content(
     upload_id: int,
     text: str,
     page_number: Optional[int] = None,
+    extraction_method: Optional[str] = None,
 ) -> ExtractedContent:
-    stmt = select(ExtractedContent).where(
-        ExtractedContent.upload_id == upload_id,
-        ExtractedContent.text == text,
-        ExtractedContent.page_number == page_number,
-    )
-    content = session.exec(stmt).first()
-
-    if content:
-        content.text = text
-        content.page_number = page_number
-    else:
+    with session_scope() as session:
         content = ExtractedContent(
-            upload_id=upload_id, text=text, page_number=page_number)
-        session.add(content)
+            upload_id=upload_id, text=text, page_number=page_number,
+            extraction_method=extraction_method, content_hash=content_hash(text))
+        [content] = _bulk_insert(session, ExtractedContent, [content],
+                                 conflict=_EXTRACTED_CONFLICT, update=_EXTRACTED_UPDATE)
+        session.commit()
+        session.refresh(content)
+        return content
 
-    session.commit()
-    session.refresh(content)
-    return content
+
+# ------------------------------
+# Bulk writes: all rows of one document in a single transaction
+# ------------------------------
+def _copy_array_item(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _copy_value(value) -> str:
+    """Render one value in COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, (list, tuple)):
+        value = "{" + ",".join(_copy_array_item(v) for v in value) + "}"
+    elif isinstance(value, bool):
+        value = "t" if value else "f"
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def _copy_insert(session: Session, table, columns: list[str], rows: list[dict],
+                 on_conflict: str = "") -> list[int]:
+    """COPY rows into a temp table, then move them over with INSERT ... RETURNING."""
+    tmp = f"_bulk_{table.name}"
+    cols = ", ".join(columns)
+    session.execute(sql_text(
+        f"CREATE TEMP TABLE {tmp} ON COMMIT DROP AS SELECT {cols} FROM {table.name} WITH NO DATA"))
+    data = "".join("\t".join(_copy_value(row[c]) for c in columns) + "\n"
+                   for row in rows)
+    cursor = session.connection().connection.driver_connection.cursor()
+    copy_sql = f"COPY {tmp} ({cols}) FROM STDIN"
+    if hasattr(cursor, "copy"):  # psycopg 3
+        with cursor.copy(copy_sql) as copy:
+            copy.write(data)
+    else:  # psycopg2
+        cursor.copy_expert(copy_sql, io.StringIO(data))
+    ids = session.execute(sql_text(
+        f"INSERT INTO {table.name} ({cols}) SELECT {cols} FROM {tmp} ORDER BY ctid {on_conflict} RETURNING id")).scalars().all()
+    session.execute(sql_text(f"DROP TABLE {tmp}"))
+    return list(ids)
+
+
+def _bulk_insert(session: Session, model: type[M], objs: list[M],
+                 conflict: Optional[list[str]] = None, update: Optional[list[str]] = None) -> list[M]:
+    """Insert ``objs`` in one round trip and return the stored rows in order.
+
+    Small batches use a multi-row INSERT ... RETURNING; batches of
+    DB_COPY_THRESHOLD rows or more go through COPY. With ``conflict`` the
+    insert is an upsert on that unique key: ``update`` columns take the new
+    value unless it is NULL. Rows in ``objs`` must be unique on that key.
+    The caller commits.
+    """
+    if not objs:
+        return []
+    table = model.__table__
+    columns = [c.name for c in table.columns if not c.primary_key]
+    rows = [{c: getattr(obj, c) for c in columns} for obj in objs]
+
+    if len(rows) >= DB_COPY_THRESHOLD:
+        on_conflict = ""
+        if conflict:
+            on_conflict = (f"ON CONFLICT ({', '.join(conflict)}) DO UPDATE SET " + ", ".join(
+                f"{c} = COALESCE(EXCLUDED.{c}, {table.name}.{c})" for c in update))
+        ids = _copy_insert(session, table, columns, rows, on_conflict)
+        stored = {row.id: row for row in session.scalars(
+            select(model).where(model.id.in_(ids)).execution_options(populate_existing=True))}
+        return [stored[i] for i in ids]
+
+    stmt = insert(model)
+    if conflict:
+        stmt = stmt.on_conflict_do_update(index_elements=conflict, set_={
+            c: func.coalesce(stmt.excluded[c], table.c[c]) for c in update})
+    return list(session.scalars(
+        stmt.returning(model, sort_by_parameter_order=True)
+        .execution_options(populate_existing=True), rows))
+
+
+def _detach(session: Session, objs: list) -> None:
+    # flushed rows keep their loaded values once detached, so the commit
+    # does not expire them and callers need no per-row refresh
+    session.flush()
+    for obj in objs:
+        session.expunge(obj)
+
+
+def bulk_upsert_extracted_content(upload_id: int, contents: List[ExtractedContent]) -> List[ExtractedContent]:
+    """upsert_extracted_content for every page of an upload in one statement.
+
+    Returned rows are detached and line up with ``contents``.
+    """
+    with session_scope() as session:
+        unique: dict[tuple, ExtractedContent] = {}
+        for content in contents:
+            content.upload_id = upload_id
+            content.content_hash = content_hash(content.text)
+            unique.setdefault(
+                (content.page_number, content.content_hash), content)
+
+        stored = dict(zip(unique, _bulk_insert(session, ExtractedContent, list(unique.values()),
+                                               conflict=_EXTRACTED_CONFLICT, update=_EXTRACTED_UPDATE)))
+        _detach(session, list(stored.values()))
+        session.commit()
+        return [stored[(content.page_number, content.content_hash)] for content in contents]
+
+
+def bulk_insert_summarized_content(contents: List[SummarizedContent]) -> List[SummarizedContent]:
+    """Insert the summaries of one document in one transaction; rows are detached."""
+    with session_scope() as session:
+        stored = _bulk_insert(session, SummarizedContent, contents)
+        _detach(session, stored)
+        session.commit()
+        return stored
+
+
+def bulk_insert_actionable_lines(lines: List[ActionableLine]) -> List[ActionableLine]:
+    """insert_actionable_line for many lines in one transaction; rows are detached."""
+    with session_scope() as session:
+        stored = _bulk_insert(session, ActionableLine, lines)
+        _detach(session, stored)
+        session.commit()
+        return stored
 
 
 # ------------------------------
 # Fetch Job with Relations
 # ------------------------------
 def fetch_job_with_details(job_id: int) -> Optional[Job]:
-    stmt = select(Job).where(Job.id == job_id)
-    job = session.exec(stmt).first()
-    return job
+    with session_scope() as session:
+        stmt = select(Job).where(Job.id == job_id)
+        job = session.exec(stmt).first()
+        return job
 
 
 # ------------------------------
 # Fetch Users
 # ------------------------------
 def fetch_user(user_id: int) -> Optional[Users]:
-    stmt = select(Users).where(Users.id == user_id)
-    user = session.exec(stmt).first()
-    return user
+    with session_scope() as session:
+        stmt = select(Users).where(Users.id == user_id)
+        user = session.exec(stmt).first()
+        return user
 
 
 def get_actionable_lines_for_job(job_id: int) -> List[ActionableLine]:
-    stmt = select(ActionableLine).where(ActionableLine.job_id == job_id)
-    lines = session.exec(stmt).all()
-    return list(lines)
+    with session_scope() as session:
+        stmt = select(ActionableLine).where(ActionableLine.job_id == job_id)
+        lines = session.exec(stmt).all()
+        return list(lines)
 
 
 # ------------------------------
-# Get a single Actionable Line with all linked data
+# Summaries produced for a Job (including those a duplicate upload links to)
 # ------------------------------
-def get_actionable_line_details(line_id: int) -> Optional[ActionableLine]:
-    stmt = select(ActionableLine).where(ActionableLine.id == line_id)
-    line = session.exec(stmt).first()
-
-    if line:
-        _ = line.job
-        _ = line.upload
-        _ = line.content
-        if line.job:
-            _ = line.job.user
+def get_summaries_for_job(job_id: int) -> List[SummarizedContent]:
+    with session_scope() as session:
+        uploads = session.exec(select(Upload).where(Upload.job_id == job_id)).all()
+        upload_ids = {u.id for u in uploads} | {
+            u.source_upload_id for u in uploads if u.source_upload_id}
+        stmt = (select(SummarizedContent)
+                .where(col(SummarizedContent.upload_id).in_(upload_ids))
+                .order_by(SummarizedContent.id))
+        return list(session.exec(stmt).all())
 
-    return line
 
-
-def extract_data(upload_id: int | None) -> tuple[list[str], list[dict]]:
+# ------------------------------
+# Get a single Actionable Line with all linked data
+# ------------------------------
+def get_actionable_line_details(line_id: int) -> Optional[ActionableLine]:
+    with session_scope() as session:
+        stmt = select(ActionableLine).where(ActionableLine.id == line_id)
+        line = session.exec(stmt).first()
+
+        if line:
+            _ = line.job
+            _ = line.upload
+            _ = line.content
+            if line.job:
+                _ = line.job.user
+
+        return line
+
+
+def extract_pages(
+    upload_id: int | None,
+    on_page: Optional[Callable[[int, int, bool], None]] = None,
+    lookup_pages: Optional[Callable[[list[str]], dict[str, dict]]] = None,
+) -> Iterator[dict]:
+    """OCR and normalize the upload, yielding pages as soon as each is ready.
+
+    Each page is ``{"page-number", "page-count", "fingerprint", "text",
+    "extraction-method", "cached", "triage", "duplicate-of"}``.
+    ``lookup_pages(fingerprints)`` returns
+    earlier results by page fingerprint (see ``app.page_cache``); pages
+    found there are not OCR'd and carry that entry as ``cached``.
+    Blank pages and copies of earlier pages (``OCR_Manager.triage_pages``)
+    are not OCR'd either: ``triage`` is "blank" or "duplicate", and a
+    duplicate takes the text of page ``duplicate-of``. They still get an
+    ExtractedContent row, so page numbering has no gaps.
+    ExtractedContent rows are written in batches of PAGE_WRITE_BATCH pages.
+    ``on_page(page_idx, total_pages, False)`` reports pages OCR could not read.
+    """
     if not upload_id:
         raise ValueError("No upload_id provided")
     print(f"[INFO] Starting extraction for upload_id={upload_id}")
 
-    upload_path = session.exec(
-        select(Upload.file_path).where(Upload.id == upload_id)
-    ).first()
+    with session_scope() as session:
+        upload_path = session.exec(
+            select(Upload.file_path).where(Upload.id == upload_id)
+        ).first()
+        # end the read transaction so the connection is not held during OCR
+        session.commit()
     if not upload_path:
         raise ValueError(
             f"[ERROR] No file path found for upload_id={upload_id}")
@@ -182,35 +572,92 @@ def extract_data(upload_id: int | None) -> tuple[list[str], list[dict]]:
     print(f"[INFO] Located file path: {upload_path}")
 
     ocm = OCR_Manager(upload_path)
-    print("[INFO] Running OCR_Manager.process_doc()...")
-    pages = ocm.process_doc()
-    print(f"[INFO] OCR complete. Total pages detected: {len(pages)}")
-
-    extraction_data_list: list[str] = []
-    actionable_data: list[dict] = []
-
-    for idx, page in enumerate(pages, start=1):
-        print(f"[INFO] Processing page {idx}/{len(pages)}...")
-        page_text = " ".join(page["content"])
-        extrcontent = upsert_extracted_content(
-            upload_id, page_text, page.get("page-number")
-        )
-        print(f"[INFO] ExtractedContent inserted with id={extrcontent.id}")
-
-        output_llm = chain.invoke({
-            "text": extrcontent.text,
-            "format_instructions": parser.get_format_instructions()
-        })
-
-        try:
-            actionable_json = json.loads(output_llm.model_dump_json())
-        except Exception as e:
-            print(f"[ERROR] Failed to parse LLM output for page {idx}: {e}")
-            actionable_json = {}
-
-        actionable_data.append(actionable_json)
-        extraction_data_list.append(extrcontent.text)
-        print(f"[INFO] Page {idx} processing complete.")
-
-    print(f"[INFO] Extraction finished for upload_id={upload_id}")
-    return extraction_data_list, actionable_data
+    fingerprints = ocm.page_fingerprints()
+    total = len(fingerprints)
+    cached = lookup_pages(fingerprints) if lookup_pages else {}
+    reuse = {i for i, fp in enumerate(fingerprints) if fp in cached}
+    if reuse:
+        print(f"[INFO] Reusing cached results for {len(reuse)}/{total} pages")
+    triage = ocm.triage_pages(skip=reuse)
+    # text of every page that a later page duplicates
+    originals = {t["duplicate-of"] for t in triage.values() if "duplicate-of" in t}
+    original_texts: dict[int, str] = {}
+
+    contents: list[ExtractedContent] = []
+    raw_tokens = tokens_saved = 0
+    try:
+        for idx, page in enumerate(ocm.iter_pages(skip=reuse | set(triage)), start=1):
+            print(f"[INFO] Processing page {idx}/{total}...")
+            triaged = triage.get(idx - 1)
+            if triaged and triaged["triage"] == "duplicate" and triaged["duplicate-of"] not in original_texts:
+                # the first copy could not be read either
+                page = None
+            if page is None:
+                print(f"[ERROR] OCR failed for page {idx}, skipping")
+                if on_page:
+                    on_page(idx, total, False)
+                continue
+            entry = cached.get(fingerprints[idx - 1]) if page.get("skipped") and not triaged else None
+            if triaged:
+                method = triaged["triage"]
+                page_text = original_texts[triaged["duplicate-of"]] if method == "duplicate" else ""
+            elif entry is not None:
+                page_text, method = entry["text"], entry["extraction-method"]
+            else:
+                page_text, norm_stats = normalize_page(page)
+                method = page.get("extraction-method")
+                raw_tokens += norm_stats["raw-tokens"]
+                tokens_saved += norm_stats["tokens-saved"]
+                print(f"[INFO] Page {idx}: {norm_stats['tokens']} tokens after normalization "
+                      f"({norm_stats['tokens-saved']} saved, {norm_stats['words-dropped']} low-confidence words dropped)")
+            page_number = page.get("page-number", idx)
+            if page_number in originals:
+                original_texts[page_number] = page_text
+            contents.append(ExtractedContent(
+                upload_id=upload_id, text=page_text,
+                page_number=page_number, extraction_method=method))
+            if len(contents) >= PAGE_WRITE_BATCH:
+                bulk_upsert_extracted_content(upload_id, contents)
+                contents = []
+            yield {"page-number": page_number, "page-count": total,
+                   "fingerprint": fingerprints[idx - 1],
+                   "text": page_text, "extraction-method": method,
+                   "cached": entry,
+                   "triage": triaged["triage"] if triaged else None,
+                   "duplicate-of": triaged.get("duplicate-of") if triaged else None}
+    finally:
+        if contents:
+            bulk_upsert_extracted_content(upload_id, contents)
+
+    print(f"[INFO] OCR complete. Total pages: {total}")
+    print(f"[INFO] Normalization saved {tokens_saved}/{raw_tokens} prompt tokens")
+
+
+def analyse_chunks(chunks: Iterable[dict], window: int = LLM_MAX_CONCURRENCY) -> Iterator[tuple[dict, dict]]:
+    """Run the analysis chain over a stream of chunks, yielding ``(chunk, analysis)``.
+
+    Chunks are analysed concurrently, at most ``window`` ahead of the
+    consumer, and come back in input order. A chunk whose LLM call fails
+    yields an empty dict instead of aborting the whole document.
+    """
+    analysis_chain, fixed_inputs = get_analysis_chain()
+
+    def analyse(chunk: dict):
+        return analysis_chain.invoke({"text": chunk["text"], **fixed_inputs})
+
+    for i, (chunk, output_llm) in enumerate(imap_bounded(analyse, chunks, window), start=1):
+        actionable_json: dict = {}
+        if isinstance(output_llm, Exception):
+            print(f"[ERROR] Failed to parse LLM output for pages {chunk['page-numbers']}: {output_llm}")
+        else:
+            try:
+                actionable_json = json.loads(output_llm.model_dump_json())
+            except Exception as e:
+                print(f"[ERROR] Failed to parse LLM output for pages {chunk['page-numbers']}: {e}")
+        for result in actionable_json.get("analysis_results", []):
+            # keep only pages that are really in this chunk
+            pages_in_chunk = [n for n in result.get("Page_Numbers", [])
+                              if n in chunk["page-numbers"]]
+            result["Page_Numbers"] = pages_in_chunk or chunk["page-numbers"]
+        print(f"[INFO] Chunk {i} (pages {chunk['page-numbers']}) analysis complete.")
+        yield chunk, actionable_json
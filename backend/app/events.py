@@ -0,0 +1,91 @@
+from datetime import datetime, timezone
+from typing import Any, Optional
+import json
+import os
+import threading
+import time
+
+# Finished jobs keep their event log this long for late or reconnecting clients
+JOB_EVENTS_TTL_SECONDS = int(os.getenv("JOB_EVENTS_TTL_SECONDS", "900"))
+# How often an SSE stream checks for new events, and sends a keep-alive
+SSE_POLL_SECONDS = float(os.getenv("SSE_POLL_SECONDS", "0.5"))
+SSE_HEARTBEAT_SECONDS = 15.0
+
+
+class JobEventLog:
+    """Append-only, in-process event log of one job.
+
+    Event ids are 1-based positions in the log, so a client resumes by
+    asking for everything after the last id it saw.
+    """
+
+    def __init__(self):
+        self.events: list[dict] = []
+        self.closed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def append(self, event: dict) -> int:
+        with self._lock:
+            self.events.append(event)
+            return len(self.events)
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed_at = time.monotonic()
+
+    def read(self, offset: int) -> tuple[list[tuple[int, dict]], bool]:
+        """Events after ``offset`` as ``(id, event)``, and whether the log is closed."""
+        with self._lock:
+            start = max(0, offset)
+            return ([(i + 1, e) for i, e in enumerate(self.events[start:], start=start)],
+                    self.closed_at is not None)
+
+
+_logs: dict[int, JobEventLog] = {}
+_logs_lock = threading.Lock()
+
+
+def _prune() -> None:
+    now = time.monotonic()
+    for job_id, log in list(_logs.items()):
+        if log.closed_at is not None and now - log.closed_at > JOB_EVENTS_TTL_SECONDS:
+            del _logs[job_id]
+
+
+def get_job_log(job_id: int) -> Optional[JobEventLog]:
+    with _logs_lock:
+        return _logs.get(job_id)
+
+
+# ------------------------------
+# Publish a job event (page stage, stored summary, status)
+# ------------------------------
+def publish(job_id: int, event_type: str, **data: Any) -> int:
+    with _logs_lock:
+        log = _logs.get(job_id)
+        if log is None:
+            _prune()
+            log = _logs[job_id] = JobEventLog()
+    return log.append({"type": event_type, "at": datetime.now(timezone.utc).isoformat(), **data})
+
+
+def close_job_log(job_id: int) -> None:
+    log = get_job_log(job_id)
+    if log is not None:
+        log.close()
+
+
+def summary_payload(obj) -> dict:
+    # a committed SummarizedContent row
+    return {"id": obj.id, "upload_id": obj.upload_id, "title": obj.title,
+            "description": obj.description, "department": obj.department,
+            "tags": obj.tags, "page_numbers": list(obj.page_numbers or [])}
+
+
+def format_sse(event_id: Optional[int], event: dict) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event, default=str)}")
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,370 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+import os
+import socket
+import threading
+import uuid
+from app.models import JobState
+from app.database import session_scope
+from app.crud import (PAGE_WRITE_BATCH, analyse_chunks, extract_pages, set_job_status, update_job_progress,
+                      claim_job, heartbeat_job, release_job, fail_exhausted_jobs, get_upload_for_job,
+                      clear_upload_results)
+from app.summarizer import summarize_topic, summary_from_analysis, store_summaries, store_cached_summaries
+from app.page_cache import load_page_results, store_page_results
+from app.page_router import record_label, route_pages
+from app.llm_runner import map_concurrently
+from app.chunking import chunk_context, iter_chunks
+from app.events import publish, close_job_log, summary_payload
+
+# Number of documents processed at the same time by this replica,
+# independent of how many uvicorn workers serve HTTP requests.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# Jobs are leased from the job table; a lease not renewed within
+# JOB_LEASE_SECONDS (crashed replica) makes the job claimable again.
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+# Claims per job before it is given up as FAILED
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Idle workers look for new jobs this often; local uploads wake them at once
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+_executor = ThreadPoolExecutor(
+    max_workers=INGEST_WORKERS + 1, thread_name_prefix="ingest")
+_wakeup = threading.Event()
+_stopping = threading.Event()
+_started = False
+# job id -> lease held by this replica
+_leases: dict[int, "JobLease"] = {}
+_leases_lock = threading.Lock()
+
+
+class LeaseLost(RuntimeError):
+    pass
+
+
+class JobLease:
+    def __init__(self, job_id: int, owner: str = WORKER_ID):
+        self.job_id = job_id
+        self.owner = owner
+        self.lost = threading.Event()
+
+    def check(self) -> None:
+        if self.lost.is_set():
+            raise LeaseLost(
+                f"Lease on job {self.job_id} lost, another worker took over")
+
+
+# ------------------------------
+# Enqueue an uploaded document for background processing
+# ------------------------------
+def submit_job(job_id: int) -> None:
+    """The job row is the queue entry; this only wakes idle local workers."""
+    print(f"[INFO] Queued job_id={job_id}")
+    _wakeup.set()
+
+
+def start_workers(vector_index) -> None:
+    global _started
+    if _started:
+        return
+    _started = True
+    print(f"[INFO] Starting {INGEST_WORKERS} ingest workers as {WORKER_ID}")
+    for _ in range(INGEST_WORKERS):
+        _executor.submit(_worker_loop, vector_index)
+    _executor.submit(_heartbeat_loop)
+
+
+def shutdown_workers(wait: bool = True) -> None:
+    _stopping.set()
+    _wakeup.set()
+    if not wait:
+        # hand unfinished jobs to other replicas instead of waiting for expiry
+        with _leases_lock:
+            leases = list(_leases.values())
+        for lease in leases:
+            # stop the job thread at its next page before another replica
+            # can claim the job, so it is never processed twice
+            lease.lost.set()
+            try:
+                release_job(lease.job_id, lease.owner, expire=True)
+            except Exception as e:
+                print(f"[WARN] Could not release job {lease.job_id}: {e}")
+    _executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+def _worker_loop(vector_index) -> None:
+    while not _stopping.is_set():
+        try:
+            fail_exhausted_jobs(JOB_MAX_ATTEMPTS)
+            job = claim_job(WORKER_ID, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS)
+        except Exception as e:
+            print(f"[WARN] Claiming a job failed: {e}")
+            job = None
+        if job is None:
+            _wakeup.wait(JOB_POLL_SECONDS)
+            _wakeup.clear()
+            continue
+        _run_leased(job.id, job.attempts, vector_index)
+
+
+def _run_leased(job_id: int, attempt: int, vector_index) -> None:
+    lease = JobLease(job_id)
+    with _leases_lock:
+        _leases[job_id] = lease
+    try:
+        upload = get_upload_for_job(job_id)
+        print(f"[INFO] {WORKER_ID} claimed job_id={job_id} (attempt {attempt})")
+        if attempt > 1:
+            # a previous attempt died midway; start from a clean slate
+            clear_upload_results(upload.id)
+        run_job(job_id, upload.id, vector_index,
+                upload.original_filename, lease=lease)
+    except Exception as e:
+        print(f"[ERROR] Job {job_id} could not be run: {e}")
+    finally:
+        with _leases_lock:
+            _leases.pop(job_id, None)
+        try:
+            release_job(job_id, lease.owner)
+        except Exception as e:
+            print(f"[WARN] Could not release job {job_id}: {e}")
+
+
+def _heartbeat_loop() -> None:
+    while not _stopping.wait(JOB_HEARTBEAT_SECONDS):
+        with _leases_lock:
+            leases = list(_leases.values())
+        for lease in leases:
+            try:
+                if not heartbeat_job(lease.job_id, lease.owner, JOB_LEASE_SECONDS):
+                    print(f"[WARN] Lease on job {lease.job_id} lost")
+                    lease.lost.set()
+            except Exception as e:
+                # a missed beat is fine as long as the next one lands in time
+                print(f"[WARN] Heartbeat for job {lease.job_id} failed: {e}")
+
+
+# ------------------------------
+# Worker body: a streaming pipeline. Pages flow OCR -> chunk packing ->
+# analysis -> summary, embedding and tagging -> persistence one chunk at a
+# time; every stage is a generator with a bounded look-ahead, so the
+# stages overlap and memory does not grow with the page count.
+# ------------------------------
+def run_job(job_id: int, upload_id: int, vector_index, source_file: str | None = None,
+            lease: JobLease | None = None) -> JobState:
+    # one pooled session for every CRUD call of this job
+    with session_scope():
+        return _run_job(job_id, upload_id, vector_index, source_file, lease)
+
+
+def _run_job(job_id: int, upload_id: int, vector_index, source_file: str | None = None,
+             lease: JobLease | None = None) -> JobState:
+    failed_pages: set[int] = set()
+    done_pages: set[int] = set()
+    # fresh pages whose chunks are not all persisted yet, by page number
+    open_pages: dict[int, dict] = {}
+    # pages served from the page cache, written in batches
+    reused: list[dict] = []
+    reused_count = 0
+    # cached summaries already stored, a multi-page one arrives with each page
+    reused_summaries: set = set()
+    # pages sent to the analysis LLM / skipped by the page router
+    routed_count = 0
+    skipped_count = 0
+
+    def on_page(idx: int, total: int, ok: bool, **counts) -> None:
+        if lease:
+            lease.check()
+        done_pages.add(idx)
+        if not ok:
+            failed_pages.add(idx)
+        update_job_progress(job_id, pages_done=len(done_pages), pages_total=total,
+                            pages_failed=len(failed_pages), **counts)
+        publish(job_id, "page", page=idx, stage="done" if ok else "failed",
+                pages_done=len(done_pages), pages_total=total)
+
+    def on_failure(stage: str, page_numbers: list[int], error: Exception) -> None:
+        print(
+            f"[ERROR] {stage} failed for job_id={job_id} pages {page_numbers}: {error}")
+        failed_pages.update(page_numbers)
+
+    def flush_reused() -> None:
+        # unchanged pages: copy their earlier summaries, already in the vector index
+        nonlocal reused, reused_count
+        if not reused:
+            return
+        try:
+            for sum_obj in store_cached_summaries(upload_id, reused, reused_summaries):
+                print(f"Reused Summarized Content {sum_obj.id}")
+                publish(job_id, "summary", reused=True,
+                        **summary_payload(sum_obj))
+        except Exception as e:
+            on_failure("Reusing summaries", [
+                page["page-number"] for page in reused], e)
+        reused_count += len(reused)
+        update_job_progress(job_id, pages_reused=reused_count)
+        for page in reused:
+            on_page(page["page-number"], page["page-count"],
+                    page["page-number"] not in failed_pages)
+        reused = []
+
+    def fresh_pages() -> Iterator[dict]:
+        for page in extract_pages(upload_id, on_page=on_page, lookup_pages=load_page_results):
+            if page["triage"]:
+                # blank, or a copy of an earlier page: nothing new for the LLM
+                publish(job_id, "page", page=page["page-number"], stage=page["triage"],
+                        duplicate_of=page["duplicate-of"])
+                on_page(page["page-number"], page["page-count"], True)
+                continue
+            publish(job_id, "page", page=page["page-number"],
+                    stage="reused" if page["cached"] is not None else "extracted")
+            if page["cached"] is not None:
+                reused.append(page)
+                if len(reused) >= PAGE_WRITE_BATCH:
+                    flush_reused()
+                continue
+            yield page
+
+    def on_skip(page: dict) -> None:
+        # no department is close enough to be worth an LLM call; the page's
+        # text is stored already, it just gets no topics
+        nonlocal skipped_count
+        skipped_count += 1
+        publish(job_id, "page", page=page["page-number"], stage="skipped",
+                score=round(page["route-score"], 3))
+        on_page(page["page-number"], page["page-count"], True,
+                pages_skipped=skipped_count)
+
+    def routed_pages() -> Iterator[dict]:
+        for page in route_pages(fresh_pages(), on_skip):
+            open_pages[page["page-number"]] = page
+            yield page
+
+    def finish_pages(page_numbers: list[int]) -> None:
+        # report the pages and remember their results for later revisions
+        nonlocal routed_count
+        entries = {}
+        for n in page_numbers:
+            page = open_pages.pop(n)
+            ok = n not in failed_pages
+            routed_count += 1
+            if ok and "route-score" in page:
+                record_label(page["route-score"], bool(page.get("topics")))
+            on_page(n, page["page-count"], ok, pages_routed=routed_count)
+            if ok:
+                entries[page["fingerprint"]] = {
+                    "text": page["text"],
+                    "extraction-method": page["extraction-method"],
+                    "analysis": page.get("topics", []),
+                    "summaries": page.get("summaries", []),
+                }
+        store_page_results(entries)
+
+    try:
+        if lease is None:
+            # leased jobs were moved to RUNNING by claim_job
+            set_job_status(job_id, JobState.RUNNING)
+        publish(job_id, "status", status=JobState.RUNNING.value)
+
+        # last page of the previous chunk; an oversized page spans chunks
+        carry = None
+        for chunk, chunk_analysis in analyse_chunks(iter_chunks(routed_pages())):
+            if lease:
+                lease.check()
+            page_numbers = chunk["page-numbers"]
+            if not chunk_analysis:
+                failed_pages.update(page_numbers)
+            for n in page_numbers:
+                publish(job_id, "page", page=n,
+                        stage="analysed" if chunk_analysis else "analysis-failed")
+            topics = chunk_analysis.get("analysis_results", [])
+
+            def summarize(department_analysis: dict):
+                if "Description" in department_analysis:
+                    # single-pass mode: the analysis call already wrote the note
+                    return summary_from_analysis(department_analysis)
+                return summarize_topic(department_analysis["Topic_Name"],
+                                       chunk_context(
+                                           chunk, department_analysis["Page_Numbers"]),
+                                       department_analysis["Department_Name"])
+
+            # topics are summarized concurrently, bounded by the shared LLM limiter
+            summaries = map_concurrently(summarize, topics)
+            # (department, summary, topic name, page numbers) per summarized topic
+            ready = []
+            for department_analysis, result in zip(topics, summaries):
+                if isinstance(result, Exception):
+                    on_failure(
+                        "Summary", department_analysis["Page_Numbers"], result)
+                else:
+                    department, summary = result
+                    ready.append((department, summary, department_analysis["Topic_Name"],
+                                  department_analysis["Page_Numbers"]))
+
+            # embedding, tag lookups and vector writes for the whole chunk at once
+            stored = []
+            try:
+                stored = store_summaries(
+                    upload_id, ready, vector_index, source_file)
+                for sum_obj in stored:
+                    print(f"Added Summarized Content {sum_obj.id}")
+                    publish(job_id, "summary", reused=False,
+                            **summary_payload(sum_obj))
+            except Exception as e:
+                on_failure("Storing summaries", sorted(
+                    {n for *_, pages in ready for n in pages}), e)
+
+            for department_analysis in topics:
+                topic = {k: v for k, v in department_analysis.items()
+                         if k != "Page_Numbers"}
+                for n in department_analysis["Page_Numbers"]:
+                    open_pages[n].setdefault("topics", []).append(topic)
+            for sum_obj in stored:
+                # the summary can only be replayed together with all of its pages
+                sources = [open_pages[n]["fingerprint"] for n in sum_obj.page_numbers]
+                for n in sum_obj.page_numbers:
+                    open_pages[n].setdefault("summaries", []).append({
+                        "title": sum_obj.title, "description": sum_obj.description,
+                        "department": sum_obj.department, "tags": sum_obj.tags,
+                        "sources": sources})
+
+            # every page but the last is complete; the last may continue
+            finished = page_numbers[:-1]
+            if carry is not None and carry not in page_numbers:
+                finished.insert(0, carry)
+            carry = page_numbers[-1]
+            finish_pages(finished)
+        if carry is not None:
+            finish_pages([carry])
+        flush_reused()
+
+        if lease:
+            lease.check()
+        total = len(done_pages)
+        if not failed_pages:
+            status = JobState.FINISHED
+        elif len(failed_pages) >= total:
+            status = JobState.FAILED
+        else:
+            status = JobState.PARTIAL
+        update_job_progress(job_id, pages_failed=len(failed_pages))
+        error = (f"{len(failed_pages)}/{total} pages failed"
+                 if failed_pages else None)
+        set_job_status(job_id, status, error=error)
+        publish(job_id, "status", status=status.value, error=error,
+                pages_total=total, pages_failed=len(failed_pages))
+        print(f"[INFO] Job {job_id} finished with status {status.value}")
+        return status
+    except LeaseLost as e:
+        # the job now belongs to another worker, which reports its outcome
+        print(f"[WARN] Job {job_id} abandoned: {e}")
+        return JobState.RUNNING
+    except Exception as e:
+        print(f"[ERROR] Job {job_id} failed: {e}")
+        set_job_status(job_id, JobState.FAILED, error=str(e))
+        publish(job_id, "status", status=JobState.FAILED.value, error=str(e))
+        return JobState.FAILED
+    finally:
+        close_job_log(job_id)
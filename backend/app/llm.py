@@ -1,16 +1,19 @@
 from typing import List
-from pydantic import BaseModel, Field, SecretStr
-from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, Field
 from langchain.prompts import ChatPromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY") or ""
-OPENAI_API_BASE = "https://openrouter.ai/api/v1"
-OPENROUTER_MODEL = "openai/gpt-5-nano"
+from app.clients import OPENROUTER_MODEL, get_chat_model
+from app.llm_cache import CachedChain
+from app.department import departments
+
+# Part of the LLM cache key: bump whenever the prompt or schema changes
+PROMPT_VERSION = "analysis-v2"
+COMBINED_PROMPT_VERSION = "combined-v2"
+# "two-stage": analysis call per page, then a summary call per topic.
+# "single-pass": one call per page returns topics together with their
+# title and actionable description.
+LLM_PIPELINE_MODE = os.getenv("LLM_PIPELINE_MODE", "two-stage")
 
 # ----------------------
 # Pydantic schemas
@@ -20,12 +23,24 @@ OPENROUTER_MODEL = "openai/gpt-5-nano"
 class AnalysisResultSchema(BaseModel):
     Department_Name: str = Field(..., description="Most relevant department")
     Topic_Name: str = Field(..., description="Concise topic name")
+    Page_Numbers: List[int] = Field(
+        default_factory=list, description="Numbers of the [Page N] sections the topic comes from")
 
 
 class AnalysisResultsList(BaseModel):
     analysis_results: List[AnalysisResultSchema]
 
 
+class CombinedResultSchema(AnalysisResultSchema):
+    Title: str = Field(..., description="Short title of the actionable note")
+    Description: str = Field(...,
+                              description="Concise, actionable note or task for the department")
+
+
+class CombinedResultsList(BaseModel):
+    analysis_results: List[CombinedResultSchema]
+
+
 # ----------------------
 # Parser
 # ----------------------
@@ -42,6 +57,7 @@ Avoid redundancy and do not force every department to be included if not relevan
 
 *Context & Rules:*
 - The data is a meeting transcript.  
+- The text may span several pages, each starting with a [Page N] marker; list the pages each topic comes from.  
 - The relevant departments are strictly limited to: "Rolling Stock Operations", "Procurement", "HR & Safety", and "Executive Management".  
 - Only include topics that are clearly important and actionable.  
 - If a department is not mentioned in a meaningful way, exclude it.  
@@ -58,18 +74,63 @@ Avoid redundancy and do not force every department to be included if not relevan
 # ----------------------
 # LLM setup
 # ----------------------
-llm = ChatOpenAI(
-    model=OPENROUTER_MODEL,
-    max_retries=2,
-    api_key=SecretStr(OPENROUTER_API_KEY),
-    base_url=OPENAI_API_BASE,
-    temperature=0.4
-)
+llm = get_chat_model()
 
 # ----------------------
 # Combine prompt + LLM + parser
 # ----------------------
-chain = prompt | llm | parser
+chain = CachedChain(prompt | llm | parser, schema=AnalysisResultsList,
+                    name="analysis", model=OPENROUTER_MODEL, prompt_version=PROMPT_VERSION)
+
+# ----------------------
+# Single-pass: analysis + summary in one call
+# ----------------------
+combined_parser = PydanticOutputParser(pydantic_object=CombinedResultsList)
+
+DEPARTMENT_DESCRIPTIONS = "\n".join(
+    f"- {dept['title']}: {dept['description']}" for dept in departments)
+
+combined_prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are an AI that analyzes documents for different departments and always responds in valid JSON format. "
+     "Keep outputs short, practical, and phrased like an actionable tip, note, or task."),
+    ("user",
+     """Analyze the text data provided below to identify only the most important and highly relevant topics,
+and for each topic write a concise actionable note for the department it concerns.
+
+*Context & Rules:*
+- The data is a meeting transcript.
+- The text may span several pages, each starting with a [Page N] marker; list the pages each topic comes from.
+- The relevant departments are strictly limited to:
+{department_descriptions}
+- Department_Name must be one of the department titles above.
+- Only include topics that are clearly important and actionable.
+- If a department is not mentioned in a meaningful way, exclude it.
+- Do not generate filler or generic topics just to cover all departments.
+- Title and Description must only contain information useful to that department;
+  do not explain what the department does or repeat generic context.
+
+*Required Output Format:*
+{format_instructions}
+
+*Text Data to Analyze:*
+{text}
+""")
+])
+
+combined_chain = CachedChain(combined_prompt | llm | combined_parser, schema=CombinedResultsList,
+                             name="combined", model=OPENROUTER_MODEL, prompt_version=COMBINED_PROMPT_VERSION)
+
+
+def get_analysis_chain(mode: str | None = None) -> tuple[CachedChain, dict]:
+    """Return the per-page chain for ``mode`` and its fixed input variables."""
+    if (mode or LLM_PIPELINE_MODE) == "single-pass":
+        return combined_chain, {
+            "department_descriptions": DEPARTMENT_DESCRIPTIONS,
+            "format_instructions": combined_parser.get_format_instructions()
+        }
+    return chain, {"format_instructions": parser.get_format_instructions()}
+
 
 # ----------------------
 # Example usage
@@ -0,0 +1,210 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+from pydantic import BaseModel
+from sqlmodel import Session, select, delete, col, func
+from app.database import engine
+from app.models import LLMCacheEntry
+from app.llm_runner import call_llm
+import hashlib
+import json
+import os
+import threading
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+# Entries kept in the in-process LRU tier
+LLM_CACHE_MEMORY_ITEMS = int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "2048"))
+# Rows kept in the Postgres tier; least recently used rows go first
+LLM_CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "100000"))
+# ... and at most this many bytes of cached values; 0 means no byte limit
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# 0 disables expiry
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+# Trim the Postgres tier after this many writes rather than on every write
+LLM_CACHE_EVICT_EVERY = 100
+
+
+def make_cache_key(chain_name: str, model: str, prompt_version: str, inputs: dict) -> str:
+    payload = json.dumps({
+        "chain": chain_name,
+        "model": model,
+        "prompt_version": prompt_version,
+        "inputs": inputs,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Two-tier cache of serialized chain outputs: in-memory LRU, then Postgres."""
+
+    def __init__(self, memory_items: int = LLM_CACHE_MEMORY_ITEMS, max_rows: int = LLM_CACHE_MAX_ROWS,
+                 ttl_seconds: int = LLM_CACHE_TTL_SECONDS, persistent: bool = True,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.memory_items = memory_items
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        # key -> (value, expires_at)
+        self._memory: OrderedDict[str, tuple[str, Optional[datetime]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0,
+                      "stores": 0, "evictions": 0, "errors": 0}
+
+    def _expiry(self) -> Optional[datetime]:
+        if self.ttl_seconds <= 0:
+            return None
+        return datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+
+    def _remember(self, key: str, value: str, expires_at: Optional[datetime]) -> None:
+        with self._lock:
+            self._memory[key] = (value, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                value, expires_at = hit
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+        if self.persistent:
+            try:
+                with Session(engine) as session:
+                    row = session.get(LLMCacheEntry, key)
+                    if row is not None:
+                        expires_at = row.expires_at
+                        if expires_at is not None and expires_at.tzinfo is None:
+                            expires_at = expires_at.replace(tzinfo=timezone.utc)
+                        if expires_at is not None and expires_at <= now:
+                            session.delete(row)
+                            session.commit()
+                        else:
+                            row.hits += 1
+                            row.last_used_at = now
+                            value = row.value
+                            session.commit()
+                            self._remember(key, value, expires_at)
+                            with self._lock:
+                                self.stats["db_hits"] += 1
+                            return value
+            except Exception as e:
+                print(f"[WARN] LLM cache lookup failed: {e}")
+                with self._lock:
+                    self.stats["errors"] += 1
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: str, chain_name: str, model: str) -> None:
+        expires_at = self._expiry()
+        self._remember(key, value, expires_at)
+        with self._lock:
+            self.stats["stores"] += 1
+            self._writes += 1
+            evict = self._writes % LLM_CACHE_EVICT_EVERY == 0
+
+        if not self.persistent:
+            return
+        try:
+            with Session(engine) as session:
+                row = session.get(LLMCacheEntry, key)
+                if row is None:
+                    row = LLMCacheEntry(key=key, chain_name=chain_name, model=model, value=value)
+                    session.add(row)
+                row.value = value
+                row.size_bytes = len(value.encode("utf-8"))
+                row.expires_at = expires_at
+                row.last_used_at = datetime.now(timezone.utc)
+                session.commit()
+            if evict:
+                self.evict()
+        except Exception as e:
+            print(f"[WARN] LLM cache store failed: {e}")
+            with self._lock:
+                self.stats["errors"] += 1
+
+    def evict(self) -> int:
+        """Drop expired rows and trim the Postgres tier to max_rows and max_bytes."""
+        removed = 0
+        with Session(engine) as session:
+            result = session.exec(delete(LLMCacheEntry).where(
+                col(LLMCacheEntry.expires_at) <= datetime.now(timezone.utc)))
+            removed += result.rowcount or 0
+            keep = select(LLMCacheEntry.key).order_by(
+                col(LLMCacheEntry.last_used_at).desc()).limit(self.max_rows)
+            result = session.exec(delete(LLMCacheEntry).where(
+                col(LLMCacheEntry.key).not_in(keep)))
+            removed += result.rowcount or 0
+            if self.max_bytes:
+                # running total of value sizes, most recently used first
+                total = func.sum(LLMCacheEntry.size_bytes).over(
+                    order_by=col(LLMCacheEntry.last_used_at).desc()).label("total")
+                ranked = select(LLMCacheEntry.key, total).subquery()
+                result = session.exec(delete(LLMCacheEntry).where(col(LLMCacheEntry.key).in_(
+                    select(ranked.c.key).where(ranked.c.total > self.max_bytes))))
+                removed += result.rowcount or 0
+            session.commit()
+        with self._lock:
+            self.stats["evictions"] += removed
+        return removed
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_items"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+llm_cache = LLMResponseCache()
+
+
+class CachedChain:
+    """Drop-in wrapper around a ``prompt | llm | parser`` chain.
+
+    ``invoke`` returns the same pydantic object the chain would, served from
+    the cache when the model, prompt version and inputs were seen before.
+    Bump ``prompt_version`` whenever the prompt template or schema changes.
+    """
+
+    def __init__(self, chain, schema: type[BaseModel], name: str, model: str, prompt_version: str,
+                 cache: LLMResponseCache = llm_cache):
+        self.chain = chain
+        self.schema = schema
+        self.name = name
+        self.model = model
+        self.prompt_version = prompt_version
+        self.cache = cache
+
+    def cache_key(self, inputs: dict[str, Any]) -> str:
+        return make_cache_key(self.name, self.model, self.prompt_version, inputs)
+
+    def invoke(self, inputs: dict[str, Any], *args, **kwargs) -> BaseModel:
+        if not LLM_CACHE_ENABLED:
+            return call_llm(self.chain.invoke, inputs, *args, **kwargs)
+
+        key = self.cache_key(inputs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self.schema.model_validate_json(cached)
+
+        # only cache misses count against the rate limit
+        result = call_llm(self.chain.invoke, inputs, *args, **kwargs)
+        self.cache.set(key, result.model_dump_json(), self.name, self.model)
+        return result
@@ -0,0 +1,136 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+import os
+import random
+import threading
+import time
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Upper bound on OpenRouter requests in flight from this process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Token bucket: sustained requests per second and burst size
+LLM_RATE_LIMIT_RPS = float(os.getenv("LLM_RATE_LIMIT_RPS", "5"))
+LLM_RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", "10"))
+# Retries on HTTP 429, on top of the client's own retries
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "5"))
+LLM_BACKOFF_BASE_SECONDS = 1.0
+LLM_BACKOFF_MAX_SECONDS = 30.0
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens +
+                                   (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_bucket = TokenBucket(LLM_RATE_LIMIT_RPS, LLM_RATE_LIMIT_BURST)
+_slots = threading.BoundedSemaphore(max(1, LLM_MAX_CONCURRENCY))
+_executor = ThreadPoolExecutor(
+    max_workers=max(1, LLM_MAX_CONCURRENCY), thread_name_prefix="llm")
+
+
+def _is_rate_limited(e: Exception) -> bool:
+    status = getattr(e, "status_code", None) or getattr(
+        getattr(e, "response", None), "status_code", None)
+    return status == 429 or type(e).__name__ == "RateLimitError"
+
+
+# ------------------------------
+# One rate-limited LLM call, retried with backoff on 429
+# ------------------------------
+def call_llm(fn: Callable[..., R], *args, **kwargs) -> R:
+    for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+        _bucket.acquire()
+        with _slots:
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if not _is_rate_limited(e) or attempt == LLM_RATE_LIMIT_RETRIES:
+                    raise
+        delay = min(LLM_BACKOFF_MAX_SECONDS,
+                    LLM_BACKOFF_BASE_SECONDS * 2 ** attempt)
+        delay *= 0.5 + random.random() / 2
+        print(f"[WARN] LLM rate limited, retrying in {delay:.1f}s")
+        time.sleep(delay)
+    raise RuntimeError("unreachable")
+
+
+# ------------------------------
+# Fan out over the shared LLM thread pool
+# ------------------------------
+def map_concurrently(fn: Callable[[T], R], items: Iterable[T]) -> list[R | Exception]:
+    """Run ``fn`` on every item and return results in input order.
+
+    A failing item yields its exception in the result list instead of
+    cancelling the rest.
+    """
+    items = list(items)
+    if LLM_MAX_CONCURRENCY <= 1 or len(items) <= 1:
+        results: list[Any] = []
+        for item in items:
+            try:
+                results.append(fn(item))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    results = [None] * len(items)
+    futures = {_executor.submit(fn, item): i for i, item in enumerate(items)}
+    for future in as_completed(futures):
+        i = futures[future]
+        error = future.exception()
+        results[i] = error if error is not None else future.result()
+    return results
+
+
+# ------------------------------
+# Streaming fan-out with a bounded look-ahead window
+# ------------------------------
+def imap_bounded(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    window: int = LLM_MAX_CONCURRENCY,
+) -> Iterator[tuple[T, R | Exception]]:
+    """Yield ``(item, result)`` pairs in input order while later items run.
+
+    At most ``window`` items are in flight; the next one is pulled from
+    ``items`` only when a slot frees up, so a lazy ``items`` generator
+    upstream is throttled to the pace of the consumer (backpressure). As in
+    map_concurrently, a failing item yields its exception.
+    """
+    window = max(1, window)
+    pending: deque = deque()
+
+    def pop() -> tuple[T, R | Exception]:
+        item, future = pending.popleft()
+        error = future.exception()
+        return item, error if error is not None else future.result()
+
+    for item in items:
+        pending.append((item, _executor.submit(fn, item)))
+        # hand over finished results early, block only when the window is full
+        while pending and (len(pending) >= window or pending[0][1].done()):
+            yield pop()
+    while pending:
+        yield pop()
@@ -0,0 +1,447 @@
+import json
+import os
+import threading
+import uuid
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: indexes are then not locked
+    fcntl = None
+
+try:
+    import hnswlib
+except ImportError:  # optional: only needed for LOCAL_VECTOR_INDEX=hnsw
+    hnswlib = None
+
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "vector_store"))
+# "exact" scans every vector; "hnsw" uses an approximate graph index
+LOCAL_VECTOR_INDEX = os.getenv("LOCAL_VECTOR_INDEX", "exact")
+INITIAL_CAPACITY = 1024
+
+# HNSW tuning: graph degree, build-time and query-time beam width
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+# Write the graph to disk (and compact the log) after this many logged
+# operations; on reload the operations after the last save are replayed
+HNSW_SAVE_EVERY = int(os.getenv("HNSW_SAVE_EVERY", "10000"))
+
+
+class LocalVectorIndex:
+    """In-process cosine index with the subset of the Pinecone ``Index`` API we use.
+
+    Vectors are stored L2-normalized as float32 rows of a memory-mapped file
+    (``vectors.f32``). Ids and metadata are kept in an append-only operation
+    log (``ops.jsonl``) that is replayed on start-up and compacted to one
+    line per stored vector by flush(). An id keeps its row until it is
+    deleted; a deleted row is a tombstone until a new id takes it over, so
+    row numbers can double as labels for an ANN index. Queries are one
+    masked matrix-vector product.
+
+    An index directory belongs to one process: it is locked while open, and
+    LOCAL_VECTOR_DIR (the ``vector_store`` volume in docker-compose) must
+    not be shared by several replicas, since each would append to the same
+    log. Use the Pinecone backend to scale out.
+    """
+
+    def __init__(self, name: str, dimension: int, root: str = LOCAL_VECTOR_DIR):
+        self.name = name
+        self.dimension = dimension
+        self.path = os.path.join(root, name)
+        os.makedirs(self.path, exist_ok=True)
+        self._vectors_path = os.path.join(self.path, "vectors.f32")
+        self._meta_path = os.path.join(self.path, "meta.json")
+        self._log_path = os.path.join(self.path, "ops.jsonl")
+        self._lock = threading.RLock()
+        self._lock_file = open(os.path.join(self.path, "lock"), "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                raise RuntimeError(f"Local vector index {self.path} is already open; "
+                                   "LOCAL_VECTOR_DIR cannot be shared between replicas")
+
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["dimension"] != dimension:
+                raise ValueError(
+                    f"Index {name} has dimension {meta['dimension']}, expected {dimension}")
+        else:
+            with open(self._meta_path, "w", encoding="utf-8") as f:
+                json.dump({"dimension": dimension}, f)
+
+        # row -> id / metadata (None once deleted), id -> row
+        self._ids: list[str | None] = []
+        self._metadata: list[dict | None] = []
+        self._positions: dict[str, int] = {}
+        self._log_lines = 0
+        # set by the header line a compacted log starts with
+        self._log_id: str | None = None
+        ops = self._replay()
+        # deleted rows, handed to the next new ids
+        self._free = [position for position, vector_id in enumerate(self._ids)
+                      if vector_id is None]
+
+        capacity = max(INITIAL_CAPACITY, len(self._ids))
+        if os.path.exists(self._vectors_path):
+            capacity = max(capacity, os.path.getsize(
+                self._vectors_path) // (4 * dimension))
+        self._open(capacity)
+        self._log = open(self._log_path, "a", encoding="utf-8")
+        self._on_replay(ops)
+
+    # ------------------------------
+    # Storage
+    # ------------------------------
+    def _replay(self) -> list[dict]:
+        ops: list[dict] = []
+        if not os.path.exists(self._log_path):
+            return ops
+        with open(self._log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    op = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn write at the tail of the log
+                if op["op"] == "compacted":
+                    self._log_id = op["log"]
+                self._apply(op)
+                ops.append(op)
+                self._log_lines += 1
+        return ops
+
+    def _apply(self, op: dict) -> None:
+        if op["op"] == "upsert":
+            position = op["pos"]
+            while len(self._ids) <= position:
+                self._ids.append(None)
+                self._metadata.append(None)
+            self._ids[position] = op["id"]
+            self._metadata[position] = op["metadata"]
+            self._positions[op["id"]] = position
+        elif op["op"] == "delete":
+            position = self._positions.pop(op["id"], None)
+            if position is not None:
+                self._ids[position] = None
+                self._metadata[position] = None
+
+    def _write_ops(self, ops: list[dict]) -> None:
+        # vectors reach the file before the log lines that point at them
+        self._vectors.flush()
+        self._log.write("".join(json.dumps(op) + "\n" for op in ops))
+        self._log.flush()
+        self._log_lines += len(ops)
+
+    def _compact_log(self) -> None:
+        # one upsert per stored vector replaces the full history; written
+        # aside and swapped in, so a crash leaves one complete log or the other.
+        # The header names this log, so a saved graph can tell it was built
+        # against an earlier one
+        self._vectors.flush()
+        self._log_id = uuid.uuid4().hex
+        ops = [{"op": "compacted", "log": self._log_id}] + [{"op": "upsert", "pos": position, "id": self._ids[position],
+                "metadata": self._metadata[position]}
+               for position in sorted(self._positions.values())]
+        tmp_path = self._log_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("".join(json.dumps(op) + "\n" for op in ops))
+            f.flush()
+            os.fsync(f.fileno())
+        self._log.close()
+        os.replace(tmp_path, self._log_path)
+        self._log = open(self._log_path, "a", encoding="utf-8")
+        self._log_lines = len(ops)
+
+    def _open(self, capacity: int) -> None:
+        size = capacity * self.dimension * 4
+        with open(self._vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._capacity = capacity
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(capacity, self.dimension))
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._alive[list(self._positions.values())] = True
+
+    def _grow(self, needed: int) -> None:
+        if needed <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        self._vectors.flush()
+        del self._vectors
+        self._open(capacity)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _match(self, position: int, score: float, include_metadata: bool) -> dict:
+        match = {"id": self._ids[position], "score": score}
+        if include_metadata:
+            match["metadata"] = self._metadata[position]
+        return match
+
+    # ------------------------------
+    # Pinecone-compatible API
+    # ------------------------------
+    def upsert(self, vectors: list[dict], **kwargs) -> dict:
+        if not vectors:
+            return {"upserted_count": 0}
+        values = self._normalize(np.asarray(
+            [v["values"] for v in vectors], dtype=np.float32))
+        with self._lock:
+            new = sum(1 for v in vectors if v["id"] not in self._positions)
+            self._grow(len(self._ids) + max(0, new - len(self._free)))
+            ops = []
+            positions = []
+            for vector, row in zip(vectors, values):
+                position = self._positions.get(vector["id"])
+                if position is None:
+                    position = self._free.pop() if self._free else len(self._ids)
+                self._vectors[position] = row
+                op = {"op": "upsert", "pos": position, "id": vector["id"],
+                      "metadata": vector.get("metadata") or {}}
+                self._apply(op)
+                self._alive[position] = True
+                ops.append(op)
+                positions.append(position)
+            self._write_ops(ops)
+            self._on_upsert(np.asarray(positions), values)
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector: list[float], top_k: int, include_metadata: bool = False, **kwargs) -> dict:
+        return self.query_many([vector], top_k, include_metadata)[0]
+
+    def query_many(self, vectors: list[list[float]], top_k: int, include_metadata: bool = False) -> list[dict]:
+        """Answer several queries with one matrix product over the stored rows."""
+        queries = self._normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            rows = len(self._ids)
+            k = min(top_k, len(self._positions))
+            if k <= 0:
+                return [{"matches": []} for _ in queries]
+            scores = queries @ self._vectors[:rows].T
+            scores[:, ~self._alive[:rows]] = -np.inf
+            results = []
+            for row_scores in scores:
+                top = np.argpartition(-row_scores, k - 1)[:k]
+                top = top[np.argsort(-row_scores[top])]
+                results.append({"matches": [self._match(i, float(row_scores[i]), include_metadata)
+                                            for i in top]})
+            return results
+
+    def fetch(self, ids: list[str], **kwargs) -> dict:
+        with self._lock:
+            return {"vectors": {
+                vector_id: {
+                    "id": vector_id,
+                    "values": self._vectors[self._positions[vector_id]].tolist(),
+                    "metadata": self._metadata[self._positions[vector_id]],
+                } for vector_id in ids if vector_id in self._positions
+            }}
+
+    def delete(self, ids: list[str] | None = None, delete_all: bool = False, **kwargs) -> dict:
+        with self._lock:
+            if delete_all:
+                ids = list(self._positions)
+            ops = []
+            for vector_id in ids or []:
+                position = self._positions.get(vector_id)
+                if position is None:
+                    continue
+                op = {"op": "delete", "id": vector_id}
+                self._apply(op)
+                self._alive[position] = False
+                self._free.append(position)
+                self._on_delete(position)
+                ops.append(op)
+            if ops:
+                self._write_ops(ops)
+        return {}
+
+    def describe_index_stats(self, **kwargs) -> dict:
+        with self._lock:
+            return {"dimension": self.dimension, "total_vector_count": len(self._positions),
+                    "rows": len(self._ids)}
+
+    def flush(self) -> None:
+        with self._lock:
+            # +1: the header line of a compacted log
+            if self._log_lines > len(self._positions) + 1:
+                self._compact_log()
+            else:
+                self._vectors.flush()
+                self._log.flush()
+
+    def close(self) -> None:
+        """Flush the files and release the directory lock; no compaction."""
+        with self._lock:
+            self._vectors.flush()
+            self._log.close()
+            self._lock_file.close()
+
+    # hooks for ANN subclasses
+    def _on_replay(self, ops: list[dict]) -> None:
+        """Called once by __init__ with the operations read from the log."""
+        pass
+
+    def _on_upsert(self, positions: np.ndarray, values: np.ndarray) -> None:
+        pass
+
+    def _on_delete(self, position: int) -> None:
+        pass
+
+
+class HnswVectorIndex(LocalVectorIndex):
+    """LocalVectorIndex with an HNSW graph (hnswlib) for sub-linear queries.
+
+    Row numbers are the graph labels. Deletes use hnswlib's mark_deleted
+    tombstones. Every HNSW_SAVE_EVERY logged operations and on flush() the
+    log is compacted and the graph saved to ``hnsw.bin`` along with the
+    compacted log's id; a reload maps the saved graph and replays only the
+    log tail written after it (the whole log if it was compacted since).
+    """
+
+    def __init__(self, name: str, dimension: int, root: str = LOCAL_VECTOR_DIR,
+                 m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION, ef_search: int = HNSW_EF_SEARCH):
+        check_index_config("hnsw")
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        super().__init__(name, dimension, root)
+
+    def _on_replay(self, ops: list[dict]) -> None:
+        self._graph_path = os.path.join(self.path, "hnsw.bin")
+        self._graph_meta_path = os.path.join(self.path, "hnsw.json")
+        self._load_graph(ops)
+
+    def _load_graph(self, ops: list[dict]) -> None:
+        saved_lines = 0
+        stale = False
+        self._graph = hnswlib.Index(space="cosine", dim=self.dimension)
+        if os.path.exists(self._graph_path) and os.path.exists(self._graph_meta_path):
+            with open(self._graph_meta_path, encoding="utf-8") as f:
+                saved = json.load(f)
+            # a crash between compacting the log and saving the graph leaves
+            # a graph of the previous log: bring it up to date with all of it
+            stale = saved.get("log") != self._log_id
+            saved_lines = 0 if stale else saved["log_lines"]
+            self._graph.load_index(self._graph_path, max_elements=self._capacity)
+        else:
+            self._graph.init_index(max_elements=self._capacity, M=self.m,
+                                   ef_construction=self.ef_construction)
+        self._graph.set_ef(self.ef_search)
+
+        # bring the graph up to date with operations logged after its last save
+        tail = ops[saved_lines:]
+        upserted = sorted({op["pos"] for op in tail if op["op"] == "upsert"
+                           and self._alive[op["pos"]]})
+        if upserted:
+            rows = np.asarray(upserted)
+            self._graph.add_items(self._vectors[rows], rows)
+        if stale or any(op["op"] == "delete" for op in tail):
+            for label in self._graph.get_ids_list():
+                if not self._alive[label]:
+                    try:
+                        self._graph.mark_deleted(label)
+                    except RuntimeError:
+                        pass  # already a tombstone
+        self._unsaved = len(tail)
+
+    def _grow(self, needed: int) -> None:
+        super()._grow(needed)
+        if self._graph.get_max_elements() < self._capacity:
+            self._graph.resize_index(self._capacity)
+
+    def _on_upsert(self, positions: np.ndarray, values: np.ndarray) -> None:
+        self._graph.add_items(values, positions)
+        self._count_ops(len(positions))
+
+    def _on_delete(self, position: int) -> None:
+        try:
+            self._graph.mark_deleted(position)
+        except RuntimeError:
+            pass
+        self._count_ops(1)
+
+    def _count_ops(self, n: int) -> None:
+        self._unsaved += n
+        if self._unsaved >= HNSW_SAVE_EVERY:
+            self._save_graph()
+
+    def _save_graph(self) -> None:
+        self._compact_log()
+        tmp_path = self._graph_path + ".tmp"
+        self._graph.save_index(tmp_path)
+        os.replace(tmp_path, self._graph_path)
+        with open(self._graph_meta_path, "w", encoding="utf-8") as f:
+            json.dump({"log": self._log_id, "log_lines": self._log_lines}, f)
+        self._unsaved = 0
+
+    def set_ef(self, ef_search: int) -> None:
+        with self._lock:
+            self.ef_search = ef_search
+            self._graph.set_ef(ef_search)
+
+    def query_many(self, vectors: list[list[float]], top_k: int, include_metadata: bool = False) -> list[dict]:
+        queries = self._normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            k = min(top_k, len(self._positions))
+            if k <= 0:
+                return [{"matches": []} for _ in queries]
+            if self.ef_search < k:
+                self._graph.set_ef(k)
+            labels, distances = self._graph.knn_query(queries, k=k)
+            if self.ef_search < k:
+                self._graph.set_ef(self.ef_search)
+            return [{"matches": [self._match(int(label), float(1 - distance), include_metadata)
+                                 for label, distance in zip(row_labels, row_distances)]}
+                    for row_labels, row_distances in zip(labels, distances)]
+
+    def flush(self) -> None:
+        with self._lock:
+            self._save_graph()
+
+
+# ------------------------------
+# Registry so create_index / connect_db share one instance per name
+# ------------------------------
+_indexes: dict[str, LocalVectorIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def has_local_index(name: str, root: str = LOCAL_VECTOR_DIR) -> bool:
+    return name in _indexes or os.path.exists(os.path.join(root, name, "meta.json"))
+
+
+def check_index_config(kind: str | None = None) -> None:
+    """Raise at startup, not on the first query, when the index kind cannot be built."""
+    kind = kind or LOCAL_VECTOR_INDEX
+    if kind not in ("exact", "hnsw"):
+        raise RuntimeError(f"Unknown LOCAL_VECTOR_INDEX={kind!r}, expected 'exact' or 'hnsw'")
+    if kind == "hnsw" and hnswlib is None:
+        raise RuntimeError("LOCAL_VECTOR_INDEX=hnsw needs hnswlib: pip install chroma-hnswlib "
+                           "(prebuilt wheels of the same hnswlib module)")
+
+
+def get_local_index(name: str, dimension: int, kind: str | None = None) -> LocalVectorIndex:
+    with _indexes_lock:
+        if name not in _indexes:
+            if (kind or LOCAL_VECTOR_INDEX) == "hnsw":
+                _indexes[name] = HnswVectorIndex(name, dimension)
+            else:
+                _indexes[name] = LocalVectorIndex(name, dimension)
+        return _indexes[name]
+
+
+def flush_local_indexes() -> None:
+    with _indexes_lock:
+        for index in _indexes.values():
+            index.flush()
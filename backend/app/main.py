@@ -1,22 +1,88 @@
 import os
-import shutil
-from fastapi import Body, FastAPI, Form, UploadFile, File, Depends, HTTPException
-from fastapi.responses import FileResponse
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import Body, FastAPI, Form, Header, Request, UploadFile, File, Depends, HTTPException
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from sqlmodel import Session
 from werkzeug.utils import secure_filename
 from app.crud import *
-from app.models import Job
-from app.database import create_db_and_tables, get_session
+from app.models import Job, JobState
+from app.database import create_db_and_tables, get_session, session_scope, pool_stats
 from app.summarizer import *
 from fastapi.middleware.cors import CORSMiddleware
 from app.vector_db import *
+from app.jobs import submit_job, start_workers, shutdown_workers
+from app.llm_cache import llm_cache
+from app.page_router import department_matrix, router_stats
+from app.local_vector_store import check_index_config, flush_local_indexes
+from app.upload_store import UploadLimitMiddleware, save_upload, UploadTooLarge
+from app.clients import close_clients
+from app.ocr import shutdown_ocr_pool
+from app.startup import StartupError, WarmUp
+from app.events import (SSE_HEARTBEAT_SECONDS, SSE_POLL_SECONDS, close_job_log, format_sse,
+                        get_job_log, publish, summary_payload)
+import asyncio
+import time
 
 UPLOAD_FOLDER = os.path.join(os.path.dirname(
     os.path.dirname(__file__)), "upload")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-app = FastAPI(title="PDF Job Processor")
+SEED_USERS = [
+    ("manager@railcorp.com", "Rolling Stock Manager"),
+    ("procurement@railcorp.com", "Procurement Officer"),
+    ("hr@railcorp.com", "HR & Safety Coordinator"),
+    ("executive@railcorp.com", "Executive Director"),
+]
+VECTOR_INDEX_NAME = "intellidoc"
+
+
+def init_database() -> None:
+    create_db_and_tables()
+    with session_scope():
+        for email, full_name in SEED_USERS:
+            upsert_user(email=email, full_name=full_name)
+
+
+def init_vector_index():
+    create_index(index_name=VECTOR_INDEX_NAME)
+    return connect_db(index_name=VECTOR_INDEX_NAME)
+
+
+warmup = WarmUp()
+warmup.add("database", init_database)
+warmup.add("vector_index", init_vector_index)
+# loads the embedding model and computes the page router's department vectors
+warmup.add("embedding_model", department_matrix)
+warmup.add("workers", lambda database, vector_index: start_workers(vector_index),
+           after=("database", "vector_index"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # everything warms up in parallel; only the schema is waited for, since
+    # every endpoint needs it. Jobs submitted before the workers are up stay
+    # PENDING and are claimed once they start.
+    if VECTOR_BACKEND == "local":
+        check_index_config()
+    warmup.start()
+    try:
+        await run_in_threadpool(warmup.wait, "database")
+    except StartupError as e:
+        raise RuntimeError(f"Database unavailable at startup: {e}") from e
+    yield
+    shutdown_workers(wait=False)
+    flush_local_indexes()
+    shutdown_ocr_pool()
+    close_clients()
+
+
+app = FastAPI(title="PDF Job Processor", lifespan=lifespan)
+
+# added first so it runs inside CORS: browsers can read its 413s
+app.add_middleware(UploadLimitMiddleware, paths=("/upload/",))
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,13 +92,11 @@ app.add_middleware(
 )
 
 
-create_db_and_tables()
-upsert_user(email="manager@railcorp.com", full_name="Rolling Stock Manager")
-upsert_user(email="procurement@railcorp.com", full_name="Procurement Officer")
-upsert_user(email="hr@railcorp.com", full_name="HR & Safety Coordinator")
-upsert_user(email="executive@railcorp.com", full_name="Executive Director")
-create_index(index_name="intellidoc")
-vector_index = connect_db(index_name="intellidoc")
+@app.get("/ready")
+def ready():
+    """200 once every startup step is done, 503 with per-step state before."""
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
 
 
 class UploadRequest(BaseModel):
@@ -54,24 +118,35 @@ def upload_pdf(file: UploadFile = File(...), user_id: int = Form(...)):
         )
 
     filename = secure_filename(file.filename)
-    save_path = os.path.join(UPLOAD_FOLDER, filename)
+    try:
+        save_path, digest, size = save_upload(file.file, UPLOAD_FOLDER)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    with session_scope():
+        # same bytes already went through the pipeline: reuse its results.
+        # Such a job is never PENDING, so no worker can claim it.
+        processed = find_processed_upload(digest)
+        job = create_job(user_id=user_id,
+                         status=JobState.FINISHED if processed else JobState.PENDING)
+        upload = upsert_upload(job_id=job.id, file_path=save_path, original_filename=filename,
+                               content_hash=digest, size_bytes=size)
 
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    with open(save_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        if processed:
+            job = link_duplicate_upload(job.id, upload.id, processed.id)
+            print(f"[INFO] Upload {upload.id} duplicates upload {processed.id}, skipping processing")
+            publish(job.id, "status", status=job.status.value,
+                    duplicate_of=processed.id)
+            close_job_log(job.id)
+            return {"job_id": job.id, "upload_id": upload.id, "status": job.status,
+                    "duplicate_of": processed.id}
 
-    job = create_job(user_id=user_id)
-    upload = upsert_upload(job_id=job.id, file_path=save_path)
-    extraction_text_lists, analysis_data = extract_data(upload.id)
-    print(analysis_data)
-    for i, page_analysis in enumerate(analysis_data):
-        for department_analysis in page_analysis["analysis_results"]:
-            sum_obj = summarize_and_store(upload.id, department_analysis["Topic_Name"], str(
-                extraction_text_lists[i]), department_analysis["Department_Name"], topic_name=department_analysis["Topic_Name"],
-                vector_index=vector_index, source_file=filename)
-            print(f"Added Summarized Content {sum_obj.id}")
+        # the job row is the queue entry; any replica's worker may claim it.
+        # No event log yet: it is created by the worker that claims the job,
+        # until then /jobs/{id}/events serves the database snapshot.
+        submit_job(job.id)
 
-    return {"job_id": job.id, "upload_id": upload.id}
+        return {"job_id": job.id, "upload_id": upload.id, "status": job.status}
 
 
 @app.get("/job-status/{job_id}")
@@ -80,7 +155,78 @@ def job_status(job_id: int, session: Session = Depends(get_session)):
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    return {"job_id": job.id, "status": job.status}
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "pages_total": job.pages_total,
+        "pages_done": job.pages_done,
+        "pages_failed": job.pages_failed,
+        "pages_reused": job.pages_reused,
+        "pages_routed": job.pages_routed,
+        "pages_skipped": job.pages_skipped,
+        "attempts": job.attempts,
+        "worker": job.lease_owner,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def job_snapshot_events(job_id: int) -> list[dict] | None:
+    job = fetch_job_with_details(job_id)
+    if not job:
+        return None
+    events = [{"type": "summary", **summary_payload(obj)}
+              for obj in get_summaries_for_job(job_id)]
+    events.append({"type": "status", "status": job.status.value, "error": job.error,
+                   "pages_total": job.pages_total, "pages_done": job.pages_done,
+                   "pages_failed": job.pages_failed, "snapshot": True})
+    return events
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: int, request: Request, offset: int = 0,
+                     last_event_id: Optional[str] = Header(None)):
+    """Server-Sent Events: page stages, committed summaries and status changes.
+
+    Every event carries an ``id``; reconnecting with ``Last-Event-ID`` (sent
+    by EventSource automatically) or ``?offset=`` resumes after it. The
+    stream ends after the job's final status. Jobs not running in this
+    process get a one-off snapshot from the database instead.
+    """
+    if last_event_id and last_event_id.isdigit():
+        offset = max(offset, int(last_event_id))
+
+    log = get_job_log(job_id)
+    snapshot = None
+    if log is None:
+        snapshot = await run_in_threadpool(job_snapshot_events, job_id)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        if snapshot is not None:
+            for event in snapshot:
+                yield format_sse(None, event)
+            return
+        sent = offset
+        last_write = time.monotonic()
+        while not await request.is_disconnected():
+            events, closed = log.read(sent)
+            for event_id, event in events:
+                yield format_sse(event_id, event)
+                sent = event_id
+                last_write = time.monotonic()
+            if closed and not events:
+                return
+            if time.monotonic() - last_write >= SSE_HEARTBEAT_SECONDS:
+                yield ": keep-alive\n\n"
+                last_write = time.monotonic()
+            await asyncio.sleep(SSE_POLL_SECONDS)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.get("/file/{upload_id}")
@@ -93,11 +239,13 @@ def get_file_by_upload_id(upload_id: int, session: Session = Depends(get_session
     if not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="File not found on server")
 
+    # stored as <sha256>.pdf; show the name it was uploaded under
+    filename = upload.original_filename or os.path.basename(file_path)
     return FileResponse(
         path=file_path,
         media_type="application/pdf",
         headers={
-            "Content-Disposition": f'inline; filename="{os.path.basename(file_path)}"'}
+            "Content-Disposition": f'inline; filename="{filename}"'}
     )
 
 
@@ -110,3 +258,18 @@ def get_summarized_by_department(department_name: str, session: Session = Depend
         raise HTTPException(
             status_code=404, detail="No summarized content found for department")
     return results
+
+
+@app.get("/llm-cache/stats")
+def get_llm_cache_stats():
+    return llm_cache.get_stats()
+
+
+@app.get("/router/stats")
+def get_router_stats():
+    return router_stats()
+
+
+@app.get("/db/pool-stats")
+def get_db_pool_stats():
+    return pool_stats()
@@ -1,6 +1,6 @@
 from enum import Enum
 from typing import Optional, List
-from sqlalchemy import String, Column
+from sqlalchemy import Integer, String, Column, Index
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime, timezone
 from sqlalchemy.dialects.postgresql import ARRAY
@@ -8,7 +8,10 @@ from sqlalchemy.dialects.postgresql import ARRAY
 
 class JobState(str, Enum):
     PENDING = "PENDING"
+    RUNNING = "RUNNING"
     FINISHED = "FINISHED"
+    PARTIAL = "PARTIAL"
+    FAILED = "FAILED"
 
 
 class Users(SQLModel, table=True):
@@ -20,12 +23,33 @@ class Users(SQLModel, table=True):
 
 
 class Job(SQLModel, table=True):
+    # replicas claim work with SELECT ... FOR UPDATE SKIP LOCKED on these
+    __table_args__ = (
+        Index("ix_job_status_lease", "status", "lease_expires_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     # points to "users" table
     user_id: int = Field(foreign_key="users.id", nullable=False)
     status: JobState = Field(default=JobState.PENDING)
+    pages_total: int = Field(default=0, nullable=False)
+    pages_done: int = Field(default=0, nullable=False)
+    pages_failed: int = Field(default=0, nullable=False)
+    # pages whose results came from the page cache
+    pages_reused: int = Field(default=0, nullable=False)
+    # pages sent to the analysis LLM and pages the page router skipped
+    pages_routed: int = Field(default=0, nullable=False)
+    pages_skipped: int = Field(default=0, nullable=False)
+    error: Optional[str] = None
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # work queue lease: the worker running the job and until when it owns it
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    attempts: int = Field(default=0, nullable=False)
 
     user: Optional["Users"] = Relationship(back_populates="jobs")
     uploads: List["Upload"] = Relationship(back_populates="job")
@@ -37,6 +61,13 @@ class Upload(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     job_id: Optional[int] = Field(default=None, foreign_key="job.id")
     file_path: str
+    # name the file was uploaded under; file_path is content-addressed
+    original_filename: Optional[str] = None
+    # hex SHA-256 of the file
+    content_hash: Optional[str] = Field(default=None, index=True, max_length=64)
+    size_bytes: Optional[int] = None
+    # set when the file was already processed: results live on that upload
+    source_upload_id: Optional[int] = Field(default=None, foreign_key="upload.id")
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc))
 
@@ -50,10 +81,20 @@ class Upload(SQLModel, table=True):
 
 
 class ExtractedContent(SQLModel, table=True):
+    # page upserts look rows up by hash instead of comparing whole texts
+    __table_args__ = (
+        Index("ux_extractedcontent_upload_page_hash",
+              "upload_id", "page_number", "content_hash", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     upload_id: int = Field(foreign_key="upload.id", nullable=False)
     text: str
     page_number: Optional[int] = None
+    # hex SHA-256 of text
+    content_hash: Optional[str] = Field(default=None, max_length=64)
+    # "text-layer", "ocr", or "blank" / "duplicate" for triaged pages
+    extraction_method: Optional[str] = None
 
     upload: Optional["Upload"] = Relationship(
         back_populates="extracted_contents")
@@ -88,6 +129,11 @@ class SummarizedContent(SQLModel, table=True):
     upload_id: Optional[int] = Field(default=None, foreign_key="upload.id")
     department: str = Field(nullable=False)
     tags: str = Field(nullable=False)
+    # pages of the upload the summary was drawn from
+    page_numbers: List[int] = Field(
+        default_factory=list,
+        sa_column=Column(ARRAY(Integer), nullable=False, server_default='{}')
+    )
 
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc), nullable=False
@@ -96,3 +142,33 @@ class SummarizedContent(SQLModel, table=True):
     upload: Optional["Upload"] = Relationship(
         back_populates="summarized_contents"
     )
+
+
+class LLMCacheEntry(SQLModel, table=True):
+    # sha256 of chain name, model, prompt version and input variables
+    key: str = Field(primary_key=True, max_length=64)
+    chain_name: str = Field(index=True, nullable=False)
+    model: str = Field(nullable=False)
+    value: str = Field(nullable=False)
+    size_bytes: int = Field(default=0, nullable=False)
+    hits: int = Field(default=0, nullable=False)
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc), nullable=False)
+    last_used_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc), nullable=False, index=True)
+    expires_at: Optional[datetime] = Field(default=None, index=True)
+
+
+class PageResultEntry(SQLModel, table=True):
+    # sha256 of the page fingerprint and the OCR / prompt settings
+    key: str = Field(primary_key=True, max_length=64)
+    text: str = Field(nullable=False)
+    extraction_method: Optional[str] = None
+    # JSON: analysis topics of the page and the summaries drawn from it
+    analysis: str = Field(default="[]", nullable=False)
+    summaries: str = Field(default="[]", nullable=False)
+    hits: int = Field(default=0, nullable=False)
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc), nullable=False)
+    last_used_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc), nullable=False, index=True)
@@ -0,0 +1,63 @@
+import os
+import re
+from app.chunking import count_tokens
+
+# OCR words below this Tesseract confidence (0-100) are treated as noise.
+# Layout rows carry -1 and are always dropped.
+OCR_MIN_CONF = float(os.getenv("OCR_MIN_CONF", "30"))
+
+_WHITESPACE = re.compile(r"\s+")
+# zero-width spaces/joiners and BOMs that PDF text layers are full of
+_INVISIBLE = re.compile("[\u200b-\u200f\u2060\ufeff]")
+
+
+def normalize_page(page: dict, min_conf: float = OCR_MIN_CONF) -> tuple[str, dict]:
+    """Build compact LLM input text from an OCR page dict.
+
+    Drops empty, layout-placeholder and low-confidence tokens, rebuilds lines
+    (one per Tesseract block/paragraph/line) and paragraphs (blank line
+    between blocks/paragraphs) and collapses whitespace. Returns the text
+    and ``{"raw-tokens", "tokens", "tokens-saved", "words-dropped"}``.
+    """
+    words = page.get("content", [])
+    confs = page.get("conf-scores") or [None] * len(words)
+    blocks = page.get("block-nums") or [0] * len(words)
+    pars = page.get("par-nums") or [0] * len(words)
+    lines = page.get("line-nums") or [0] * len(words)
+
+    paragraphs: list[list[str]] = []
+    current_line: list[str] = []
+    line_key = paragraph_key = None
+    dropped = 0
+
+    def end_line() -> None:
+        if current_line:
+            paragraphs[-1].append(" ".join(current_line))
+            current_line.clear()
+
+    for word, conf, block, par, line in zip(words, confs, blocks, pars, lines):
+        word = _WHITESPACE.sub(" ", _INVISIBLE.sub("", str(word))).strip()
+        if not word:
+            continue
+        if conf is not None and float(conf) < min_conf:
+            dropped += 1
+            continue
+        if (block, par) != paragraph_key:
+            end_line()
+            paragraphs.append([])
+            paragraph_key = (block, par)
+        if (block, par, line) != line_key:
+            end_line()
+            line_key = (block, par, line)
+        current_line.append(word)
+    end_line()
+
+    text = "\n\n".join("\n".join(p) for p in paragraphs if p)
+    raw_tokens = count_tokens(" ".join(str(w) for w in words))
+    tokens = count_tokens(text)
+    return text, {
+        "raw-tokens": raw_tokens,
+        "tokens": tokens,
+        "tokens-saved": raw_tokens - tokens,
+        "words-dropped": dropped,
+    }
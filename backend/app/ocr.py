@@ -1,37 +1,666 @@
 import pytesseract as pyt
 from pytesseract import Output
+from concurrent.futures import ProcessPoolExecutor, Future
+from contextlib import ExitStack, contextmanager
+from typing import Iterator
+import multiprocessing as mp
 import numpy as np
+import hashlib
+import resource
+import threading
+import queue
 import fitz
+import os
+
+try:
+    import tesserocr
+except ImportError:  # optional: falls back to the pytesseract subprocess
+    tesserocr = None
+
+OCR_DPI = 300
+# "bounded": grayscale, DPI lowered to fit OCR_MAX_PIXELS, rendered in strips
+# into a buffer reused across pages. "full": one RGB pixmap per page at OCR_DPI.
+OCR_RENDER_MODE = os.getenv("OCR_RENDER_MODE", "bounded")
+# Pixels per rendered page in bounded mode; A4 at 300 dpi is 8.7M
+OCR_MAX_PIXELS = int(os.getenv("OCR_MAX_PIXELS", "12000000"))
+# The pixel budget never pushes a page below this; Tesseract's accuracy
+# drops quickly under it
+OCR_MIN_DPI = int(os.getenv("OCR_MIN_DPI", "150"))
+# Rows rendered per strip: bounds MuPDF's own pixmap to one strip
+OCR_RENDER_STRIP_ROWS = 512
+# Resident memory a rendering process may reach, in MB. A page that cannot
+# fit, even at OCR_MIN_DPI, fails on its own instead of the process being
+# OOM-killed. 0 disables the cap.
+OCR_MEMORY_CAP_MB = int(os.getenv("OCR_MEMORY_CAP_MB", "0"))
+# Working memory per rendered pixel: the page buffer plus Tesseract's
+# thresholded and intermediate copies
+OCR_BYTES_PER_PIXEL = 4
+# Worker processes used by process_doc; 0 means one per CPU core, 1 keeps
+# the original sequential, single-process behaviour.
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0"))
+# Born-digital pages are read from the embedded text layer instead of being
+# rasterized and OCR'd. Set USE_TEXT_LAYER=0 to always OCR.
+USE_TEXT_LAYER = os.getenv("USE_TEXT_LAYER", "1") != "0"
+# A text layer shorter than this (scans, image-only pages, stray page
+# numbers) is not trusted and the page goes through OCR.
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", "50"))
+# Share of characters that must be letters, digits, whitespace or common
+# punctuation; broken font encodings fall below this.
+TEXT_LAYER_MIN_CLEAN_RATIO = 0.9
+TEXT_LAYER_CONF = 100.0
+# "auto" uses the in-process tesserocr engine when it is installed,
+# "pytesseract" forces one tesseract subprocess per page.
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto")
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+# Loaded engines kept per process; each holds its own copy of the
+# language model, so this bounds memory as well as concurrency.
+OCR_ENGINE_POOL_SIZE = int(os.getenv("OCR_ENGINE_POOL_SIZE", "1"))
+# Where tesserocr looks for <lang>.traineddata; defaults to the path the
+# tesserocr build was configured with
+TESSDATA_PREFIX = os.getenv("TESSDATA_PREFIX")
+
+# Resolution of the grayscale thumbnail hashed to fingerprint scanned pages
+FINGERPRINT_DPI = 72
+# Blank and repeated pages are not OCR'd (see OCR_Manager.triage_pages)
+PAGE_TRIAGE = os.getenv("PAGE_TRIAGE", "1") != "0"
+# Also drop scanned pages that merely look like an earlier one (perceptual
+# hash). Off by default: different letters on one letterhead can hash as
+# close as rescans of the same page, and a dropped page is never read
+TRIAGE_NEAR_DUPLICATES = os.getenv("TRIAGE_NEAR_DUPLICATES", "0") == "1"
+# Fraction of ink pixels below which a page counts as blank
+TRIAGE_BLANK_INK_RATIO = float(os.getenv("TRIAGE_BLANK_INK_RATIO", "0.002"))
+# A pixel is ink when it is this much darker than the page's median (paper) level
+TRIAGE_INK_CONTRAST = 64
+# Border ignored on every side: scanner edges, punch holes, staple shadows
+TRIAGE_MARGIN = 0.05
+# The perceptual hash compares neighbouring cells of a TRIAGE_HASH_SIZE grid
+# laid over the page's inked area
+TRIAGE_HASH_SIZE = 12
+# Cell differences smaller than this fraction of the mean difference are
+# "equal": flat paper areas would otherwise give random bits
+TRIAGE_HASH_DEADBAND = 0.75
+# Rows/columns with this little contrast do not count towards the inked area
+TRIAGE_BOX_CONTRAST = 32
+# Pages whose hashes are at most this far apart are duplicates (out of 312
+# for a 12x12 grid). Different pages of a same-letterhead pack measured 31
+# apart, so keep this well below that; see benchmarks/page_triage.py
+TRIAGE_DUP_MAX_DISTANCE = float(os.getenv("TRIAGE_DUP_MAX_DISTANCE", "20"))
+# ... and whose ink ratios are within this relative tolerance
+TRIAGE_DUP_INK_TOLERANCE = 0.15
+
+TSV_INT_COLUMNS = ("level", "page_num", "block_num", "par_num", "line_num",
+                   "word_num", "left", "top", "width", "height")
+
+
+# ------------------------------
+# OCR backends: both return the same column dict as
+# pytesseract.image_to_data(..., output_type=Output.DICT)
+# ------------------------------
+class OCRBackend:
+    name = "base"
+
+    def image_to_data(self, image_vector: np.ndarray) -> dict[str, list]:
+        raise NotImplementedError
+
+
+class PytesseractBackend(OCRBackend):
+    """Spawns a tesseract process per page; always available."""
+    name = "pytesseract"
+
+    def __init__(self, lang: str = OCR_LANG):
+        self.lang = lang
+
+    def image_to_data(self, image_vector: np.ndarray) -> dict[str, list]:
+        return pyt.image_to_data(image_vector, lang=self.lang, output_type=Output.DICT)
+
+
+class TesserocrPoolBackend(OCRBackend):
+    """Keeps initialized TessBaseAPI engines and feeds them raw pixel buffers.
+
+    The language data is loaded once per engine and each page's pixels are
+    copied into the engine's buffer in memory, so there is no process
+    start-up, temp file or TSV round trip through the filesystem per page.
+    """
+    name = "tesserocr"
+
+    def __init__(self, lang: str = OCR_LANG, pool_size: int = OCR_ENGINE_POOL_SIZE):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr is not installed")
+        self.lang = lang
+        # the manylinux wheels otherwise look for tessdata in the working directory
+        self.path = TESSDATA_PREFIX or tesserocr.get_languages()[0]
+        self.pool_size = max(1, pool_size)
+        self._engines: queue.Queue = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        # load the first engine now so a missing tessdata fails fast
+        self._engines.put(self._new_engine())
+        self._created = 1
+
+    def _new_engine(self):
+        try:
+            return tesserocr.PyTessBaseAPI(path=self.path, lang=self.lang)
+        except RuntimeError as e:
+            raise RuntimeError(f"cannot load {self.lang!r} from tessdata path {self.path!r}: {e}") from e
+
+    @contextmanager
+    def _engine(self) -> Iterator:
+        with self._lock:
+            if self._engines.empty() and self._created < self.pool_size:
+                self._engines.put(self._new_engine())
+                self._created += 1
+        api = self._engines.get()
+        try:
+            yield api
+        finally:
+            api.Clear()
+            self._engines.put(api)
+
+    def image_to_data(self, image_vector: np.ndarray) -> dict[str, list]:
+        image = np.ascontiguousarray(image_vector)
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        with self._engine() as api:
+            api.SetImageBytes(image.tobytes(), width, height,
+                              channels, width * channels)
+            api.Recognize()
+            tsv = api.GetTSVText(0)
+        return _parse_tsv(tsv)
+
+    def close(self) -> None:
+        while not self._engines.empty():
+            self._engines.get().End()
+        self._created = 0
+
+
+def _parse_tsv(tsv: str) -> dict[str, list]:
+    columns = TSV_INT_COLUMNS + ("conf", "text")
+    data: dict[str, list] = {col: [] for col in columns}
+    for row in tsv.splitlines():
+        fields = row.split("\t")
+        if len(fields) < len(columns) - 1 or fields[0] == "level":
+            continue
+        if len(fields) == len(columns) - 1:
+            fields.append("")
+        for col, value in zip(TSV_INT_COLUMNS, fields):
+            data[col].append(int(value))
+        data["conf"].append(float(fields[10]))
+        data["text"].append(fields[11])
+    return data
+
+
+_backend: OCRBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def get_ocr_backend(name: str | None = None) -> OCRBackend:
+    """Return the process-wide OCR backend, creating it on first use."""
+    global _backend
+    name = name or OCR_BACKEND
+    with _backend_lock:
+        if _backend is None or (name != "auto" and _backend.name != name):
+            _backend = None
+            if name == "tesserocr" or (name == "auto" and tesserocr is not None):
+                try:
+                    _backend = TesserocrPoolBackend()
+                except RuntimeError as e:
+                    if name == "tesserocr":
+                        raise
+                    print(f"[WARN] tesserocr engine could not start ({e}); falling back to "
+                          "one pytesseract subprocess per page. Set TESSDATA_PREFIX to fix.")
+            if _backend is None:
+                _backend = PytesseractBackend()
+        return _backend
+
+
+def _render_page(page, dpi: int = OCR_DPI) -> np.ndarray:
+    page_pix = page.get_pixmap(dpi=dpi)
+    return np.frombuffer(page_pix.samples, dtype=np.uint8).reshape(
+        page_pix.height, page_pix.width, page_pix.n)
+
+
+# ------------------------------
+# Memory-bounded rendering
+# ------------------------------
+class PageMemoryError(MemoryError):
+    pass
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # no procfs: fall back to the lifetime peak (kB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def bounded_dpi(page, dpi: int, max_pixels: int = OCR_MAX_PIXELS) -> int:
+    """Highest DPI up to ``dpi`` whose render fits ``max_pixels`` (not below OCR_MIN_DPI)."""
+    area_sq_in = max(page.rect.width * page.rect.height / (72 * 72), 1e-6)
+    fit = int((max_pixels / area_sq_in) ** 0.5)
+    return max(min(dpi, fit), min(dpi, OCR_MIN_DPI))
+
+
+def _capped_dpi(page, dpi: int) -> int:
+    """bounded_dpi, further lowered so the render fits under OCR_MEMORY_CAP_MB."""
+    max_pixels = OCR_MAX_PIXELS
+    if OCR_MEMORY_CAP_MB > 0:
+        headroom = OCR_MEMORY_CAP_MB * 1024 * 1024 - rss_bytes()
+        max_pixels = min(max_pixels, max(headroom, 0) // OCR_BYTES_PER_PIXEL)
+    dpi = bounded_dpi(page, dpi, max_pixels)
+    if OCR_MEMORY_CAP_MB > 0:
+        pixels = page.rect.width * page.rect.height * (dpi / 72) ** 2
+        if pixels > max_pixels:
+            raise PageMemoryError(
+                f"{pixels / 1e6:.1f}M pixels at {dpi} dpi exceed the {OCR_MEMORY_CAP_MB} MB memory cap")
+    return dpi
+
+
+_render_buffers = threading.local()
+
+
+def _page_buffer(height: int, width: int) -> np.ndarray:
+    """A (height, width) view into this thread's render buffer, grown on demand."""
+    buffer = getattr(_render_buffers, "buffer", None)
+    if buffer is None or buffer.size < height * width:
+        _render_buffers.buffer = buffer = np.empty(height * width, dtype=np.uint8)
+    return buffer[:height * width].reshape(height, width)
+
+
+def _render_gray_bounded(page, dpi: int) -> tuple[np.ndarray, int]:
+    """Render ``page`` in grayscale, strip by strip, into the thread's buffer.
+
+    Returns the image and the DPI used. The image is only valid until the
+    next render on the same thread.
+    """
+    dpi = _capped_dpi(page, dpi)
+    matrix = fitz.Matrix(dpi / 72, dpi / 72)
+    rect = page.rect
+    bounds = (rect * matrix).irect
+    image = _page_buffer(bounds.height, bounds.width)
+    image.fill(255)
+    for top in range(0, bounds.height, OCR_RENDER_STRIP_ROWS):
+        bottom = min(top + OCR_RENDER_STRIP_ROWS, bounds.height)
+        clip = fitz.Rect(rect.x0, rect.y0 + top * 72 / dpi,
+                         rect.x1, rect.y0 + bottom * 72 / dpi)
+        pix = page.get_pixmap(matrix=matrix, clip=clip, colorspace=fitz.csGRAY, alpha=False)
+        strip = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+        y, x = pix.y - bounds.y0, pix.x - bounds.x0
+        rows = min(pix.height, bounds.height - y)
+        cols = min(pix.width, bounds.width - x)
+        image[y:y + rows, x:x + cols] = strip[:rows, :cols]
+        del pix, strip
+    return image, dpi
+
+
+def render_for_ocr(page, dpi: int = OCR_DPI, mode: str | None = None) -> tuple[np.ndarray, int]:
+    """Page image for Tesseract and the DPI it was rendered at."""
+    if (mode or OCR_RENDER_MODE) == "full":
+        return _render_page(page, dpi), dpi
+    return _render_gray_bounded(page, dpi)
+
+
+def _read_page(page, page_index: int, dpi: int) -> dict | None:
+    """Render and OCR one page; None if either fails."""
+    try:
+        image_vector, used_dpi = render_for_ocr(page, dpi)
+        rss = rss_bytes()
+        data = _ocr_image(image_vector, page_index)
+        del image_vector
+        data["render-dpi"] = used_dpi
+        data["rss-bytes"] = max(rss, rss_bytes())
+        return data
+    except Exception as e:
+        print(f"An error occurred on PAGE {page_index + 1}: {e}")
+
+
+def _ocr_image(image_vector, page_number: int) -> dict:
+    data = {
+        "content": [],
+        "page-number": page_number + 1,
+        "conf-scores": [],
+        "extraction-method": "ocr"
+    }
+    results = get_ocr_backend().image_to_data(image_vector)
+    data["content"] = results["text"]
+    data["conf-scores"] = results["conf"]
+    # layout, used by app.normalize to rebuild lines and paragraphs
+    data["block-nums"] = results["block_num"]
+    data["par-nums"] = results["par_num"]
+    data["line-nums"] = results["line_num"]
+    return data
+
+
+# ------------------------------
+# Text-layer triage
+# ------------------------------
+def _is_clean_char(ch: str) -> bool:
+    return ch.isalnum() or ch.isspace() or ch in ".,;:!?'\"()[]{}-/&%@#*+=_<>|$€₹°"
+
+
+def _text_layer_words(page) -> list[tuple] | None:
+    """Return the page's embedded word tuples, or None if the page needs OCR."""
+    # reading order: block by block, so the columns of a two-column page
+    # are not interleaved line by line as a top-to-bottom sort would
+    words = sorted(page.get_text("words"), key=lambda w: (w[5], w[6], w[7]))
+    text = "".join(w[4] for w in words)
+    if len(text) < TEXT_LAYER_MIN_CHARS:
+        return None
+    clean = sum(1 for ch in text if _is_clean_char(ch))
+    if clean / len(text) < TEXT_LAYER_MIN_CLEAN_RATIO:
+        return None
+    return words
+
+
+def _text_layer_result(words: list[tuple], page_number: int) -> dict:
+    # fitz word tuples: (x0, y0, x1, y1, word, block_no, line_no, word_no)
+    return {
+        "content": [w[4] for w in words],
+        "page-number": page_number + 1,
+        "conf-scores": [TEXT_LAYER_CONF] * len(words),
+        "extraction-method": "text-layer",
+        "block-nums": [w[5] for w in words],
+        "par-nums": [0] * len(words),
+        "line-nums": [w[6] for w in words]
+    }
+
+
+def _page_fingerprint(page, words: list[tuple] | None, gray: np.ndarray | None = None) -> str:
+    """Content hash of a page: its text layer when usable, else a low-res render.
+
+    ``gray`` is the page rendered by _render_gray, if the caller has it.
+    """
+    sha = hashlib.sha256()
+    if words is not None:
+        sha.update(b"text-layer\0")
+        for w in words:
+            sha.update(f"{w[0]:.1f},{w[1]:.1f},{w[4]}\0".encode("utf-8"))
+    else:
+        if gray is None:
+            gray = _render_gray(page)
+        height, width = gray.shape
+        sha.update(f"image\0{width}x{height}\0".encode("utf-8"))
+        sha.update(gray.tobytes())
+    return sha.hexdigest()
+
+
+# ------------------------------
+# Blank / near-duplicate triage on the low-res grayscale render
+# ------------------------------
+def _render_gray(page, dpi: int = FINGERPRINT_DPI) -> np.ndarray:
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+
+
+def _crop_margin(gray: np.ndarray, margin: float = TRIAGE_MARGIN) -> np.ndarray:
+    dy, dx = int(gray.shape[0] * margin), int(gray.shape[1] * margin)
+    inner = gray[dy:gray.shape[0] - dy, dx:gray.shape[1] - dx]
+    return inner if inner.size else gray
+
+
+def ink_ratio(gray: np.ndarray) -> float:
+    """Fraction of pixels clearly darker than the paper, borders excluded."""
+    inner = _crop_margin(gray)
+    paper = int(np.median(inner))
+    return float(np.count_nonzero(inner < paper - TRIAGE_INK_CONTRAST)) / inner.size
+
+
+def _block_means(gray: np.ndarray, rows: int, cols: int) -> np.ndarray:
+    height, width = gray.shape
+    row_edges = np.linspace(0, height, min(rows, height) + 1).astype(int)[:-1]
+    col_edges = np.linspace(0, width, min(cols, width) + 1).astype(int)[:-1]
+    sums = np.add.reduceat(np.add.reduceat(gray.astype(np.float32), row_edges, axis=0),
+                           col_edges, axis=1)
+    counts = np.outer(np.diff(np.append(row_edges, height)),
+                      np.diff(np.append(col_edges, width)))
+    return sums / counts
+
+
+def _ink_box(gray: np.ndarray) -> np.ndarray:
+    """The page cropped to its inked rows and columns, so a shifted or
+    slightly rescaled scan of the same sheet lines up with the original."""
+    ink = gray < int(np.median(gray)) - TRIAGE_BOX_CONTRAST
+    min_pixels = max(2, int(0.003 * max(gray.shape)))
+    rows = np.flatnonzero(np.count_nonzero(ink, axis=1) >= min_pixels)
+    cols = np.flatnonzero(np.count_nonzero(ink, axis=0) >= min_pixels)
+    if len(rows) < 2 or len(cols) < 2:
+        return gray
+    return gray[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+
+def perceptual_hash(gray: np.ndarray, size: int = TRIAGE_HASH_SIZE) -> np.ndarray:
+    """Ternary gradient hash: for each pair of horizontally or vertically
+    adjacent grid cells, +1/-1 when one is clearly brighter, 0 when they are
+    within the deadband.
+
+    Block means over the inked area blur away scanner noise, and the
+    deadband keeps near-equal neighbours from flipping between scans.
+    """
+    means = _block_means(_ink_box(_crop_margin(gray)), size + 1, size + 1)
+    diffs = np.concatenate([(means[:, 1:] - means[:, :-1]).ravel(),
+                            (means[1:, :] - means[:-1, :]).ravel()])
+    band = TRIAGE_HASH_DEADBAND * np.abs(diffs).mean()
+    return (np.sign(diffs) * (np.abs(diffs) > band)).astype(np.int8)
+
+
+def hash_distances(hashes: np.ndarray, page_hash: np.ndarray) -> np.ndarray:
+    """Distance of ``page_hash`` to each row of ``hashes``: 1 per opposite
+    sign, 0.5 per cell that is equal in one hash only."""
+    return np.abs(hashes.astype(np.int16) - page_hash).sum(axis=-1) / 2
+
+
+# ------------------------------
+# Process-pool workers: every worker opens the PDF itself and renders its own
+# pages, so pixmaps never cross process boundaries. One pool serves every
+# document, so each worker loads its OCR engine once.
+# ------------------------------
+_worker_document = None
+_worker_pdf_path: str | None = None
+_pool: ProcessPoolExecutor | None = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _ocr_page_worker(pdf_path: str, page_index: int, dpi: int) -> dict | None:
+    global _worker_document, _worker_pdf_path
+    if _worker_pdf_path != pdf_path:
+        if _worker_document is not None:
+            _worker_document.close()
+        _worker_document = fitz.open(pdf_path)
+        _worker_pdf_path = pdf_path
+    return _read_page(_worker_document[page_index], page_index, dpi)
+
+
+def get_ocr_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared OCR process pool, (re)created if it has a different
+    size or a worker died."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers or getattr(_pool, "_broken", False):
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # spawn, not fork: the API process is multi-threaded
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_ocr_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
 
 
 class OCR_Manager:
-    def __init__(self, pdf_path:str): 
+    def __init__(self, pdf_path: str, workers: int | None = None, dpi: int = OCR_DPI,
+                 use_text_layer: bool | None = None):
+        self.__pdf_path = pdf_path
         self.__document = fitz.open(pdf_path)
+        self.__workers = workers if workers is not None else OCR_WORKERS
+        if self.__workers <= 0:
+            self.__workers = os.cpu_count() or 1
+        self.__dpi = dpi
+        self.__use_text_layer = USE_TEXT_LAYER if use_text_layer is None else use_text_layer
+        # page index -> usable text-layer words (None: needs OCR)
+        self.__words: dict[int, list[tuple] | None] = {}
+        # page index -> (ink ratio, perceptual hash), for pages that need OCR
+        self.__image_stats: dict[int, tuple[float, np.ndarray]] = {}
+        self.__fingerprints: list[str] | None = None
+        self.__memory = {"pages-rendered": 0, "pages-downscaled": 0,
+                         "lowest-dpi": None, "peak-rss-bytes": 0}
+
+    def __text_layer(self, i: int) -> list[tuple] | None:
+        if i not in self.__words:
+            self.__words[i] = _text_layer_words(
+                self.__document[i]) if self.__use_text_layer else None
+        return self.__words[i]
 
-    def process_doc(self) -> list[dict] | None:
+    def page_fingerprints(self) -> list[str]:
+        """Per-page content hashes, in page order; call before process_doc."""
+        fingerprints = []
+        for i, page in enumerate(self.__document):
+            words = self.__text_layer(i)
+            gray = None
+            if words is None:
+                # one low-res render serves the fingerprint and the triage
+                gray = _render_gray(page)
+                self.__image_stats[i] = (ink_ratio(gray), perceptual_hash(gray))
+            fingerprints.append(_page_fingerprint(page, words, gray))
+        self.__fingerprints = fingerprints
+        return fingerprints
+
+    def triage_pages(self, skip: set[int] | None = None) -> dict[int, dict]:
+        """Pages not worth reading, by page index.
+
+        Scanned pages with almost no ink are ``{"triage": "blank"}``. A page
+        identical to an earlier one (same fingerprint) is ``{"triage":
+        "duplicate", "duplicate-of": n}`` with ``n`` the 1-based number of the
+        first copy; with TRIAGE_NEAR_DUPLICATES, so is a scanned page whose
+        perceptual hash is within TRIAGE_DUP_MAX_DISTANCE of an earlier
+        scanned page. Pages in ``skip`` are never triaged but still count as
+        originals.
+        """
+        if not PAGE_TRIAGE:
+            return {}
+        fingerprints = self.__fingerprints or self.page_fingerprints()
+        triage: dict[int, dict] = {}
+        first_copy: dict[str, int] = {}
+        # scanned pages kept so far, with their hashes and ink ratios as rows
+        kept: list[int] = []
+        hashes = np.empty((len(fingerprints), 2 * TRIAGE_HASH_SIZE * (TRIAGE_HASH_SIZE + 1)),
+                          dtype=np.int8)
+        inks = np.empty(len(fingerprints), dtype=np.float32)
+        for i, fingerprint in enumerate(fingerprints):
+            skipped = skip is not None and i in skip
+            if fingerprint in first_copy and not skipped:
+                original = first_copy[fingerprint]
+                triage[i] = triage.get(original) or {
+                    "triage": "duplicate", "duplicate-of": original + 1}
+                continue
+            first_copy.setdefault(fingerprint, i)
+            if i not in self.__image_stats:
+                continue
+            ink, page_hash = self.__image_stats[i]
+            if ink < TRIAGE_BLANK_INK_RATIO and not skipped:
+                triage[i] = {"triage": "blank"}
+                continue
+            n = len(kept)
+            if n and TRIAGE_NEAR_DUPLICATES and not skipped:
+                distances = hash_distances(hashes[:n], page_hash)
+                close = (distances <= TRIAGE_DUP_MAX_DISTANCE) & (
+                    np.abs(inks[:n] - ink) <= TRIAGE_DUP_INK_TOLERANCE * np.maximum(inks[:n], ink))
+                if close.any():
+                    original = kept[int(np.argmax(close))]
+                    triage[i] = {"triage": "duplicate", "duplicate-of": original + 1}
+                    continue
+            hashes[n] = page_hash
+            inks[n] = ink
+            kept.append(i)
+        if triage:
+            blank = sum(1 for t in triage.values() if t["triage"] == "blank")
+            print(f"[INFO] Triage: {blank} blank and {len(triage) - blank} duplicate pages not read")
+        return triage
+
+    def process_doc(self, skip: set[int] | None = None) -> list[dict | None] | None:
+        """OCR every page; pages whose index is in ``skip`` are not read and
+        come back as ``{"page-number": n, "skipped": True}``."""
         try:
-            pagewise_json_data = []
-            for i, page in enumerate(self.__document):
-                print(f"Performing OCR on PAGE {i+1}.")
-                page_pix = page.get_pixmap(dpi=300)
-                image_vector = np.frombuffer(page_pix.samples, dtype=np.uint8).reshape(
-                    page_pix.height, page_pix.width, page_pix.n)
-                pagewise_json_data.append(self.__process_page(image_vector, i))
-            self.__document.close()
-            return pagewise_json_data
+            return list(self.iter_pages(skip))
         except Exception as e:
             print(f"Error: {e}")
 
-    def __process_page(self, image_vector, page_number: int) -> list[dict] | None:
-        try:
-            data = {
-                "content":[],
-                "page-number": page_number + 1,
-                "conf-scores":[]
-            } 
-            results = pyt.image_to_data(image_vector, output_type=Output.DICT)
-            data["content"] = results["text"]
-            data["conf-scores"] = results["conf"]
-            return data
-        except Exception as e:
-            print(f"An error occurred: {e}")
+    def iter_pages(self, skip: set[int] | None = None) -> Iterator[dict | None]:
+        """Yield page results in page order as soon as each one is ready.
+
+        Same results as process_doc, but streamed: a consumer can start on
+        page 1 while later pages are still being OCR'd. At most two pages per
+        worker are in flight, and no more are started until the consumer
+        pulls, so memory stays flat no matter how long the document is.
+        """
+        with ExitStack() as stack:
+            stack.callback(self.__document.close)
+            count = self.__document.page_count
+            ocr_pages = [i for i in range(count)
+                         if not (skip and i in skip) and self.__text_layer(i) is None]
+
+            pool = None
+            if self.__workers > 1 and len(ocr_pages) > 1:
+                max_in_flight = self.__workers * 2
+                print(
+                    f"Performing OCR on {len(ocr_pages)} pages with {self.__workers} processes.")
+                pool = get_ocr_pool(self.__workers)
+            pending = iter(ocr_pages)
+            in_flight: dict[int, Future] = {}
+            # pages of this document not consumed yet (early exit or error)
+            stack.callback(lambda: [future.cancel() for future in in_flight.values()])
+
+            for i in range(count):
+                if skip and i in skip:
+                    yield {"page-number": i + 1, "skipped": True}
+                    continue
+                words = self.__text_layer(i)
+                if words is not None:
+                    print(f"Using text layer for PAGE {i+1}.")
+                    yield _text_layer_result(words, i)
+                    continue
+                if pool is None:
+                    print(f"Performing OCR on PAGE {i+1}.")
+                    result = _read_page(self.__document[i], i, self.__dpi)
+                else:
+                    # top the window up; page i is always the oldest in flight
+                    while len(in_flight) < max_in_flight and (page_index := next(pending, None)) is not None:
+                        in_flight[page_index] = pool.submit(
+                            _ocr_page_worker, self.__pdf_path, page_index, self.__dpi)
+                    result = in_flight.pop(i).result()
+                    print(f"OCR done for PAGE {i + 1}.")
+                self.__track_memory(result)
+                yield result
+
+            if self.__memory["pages-rendered"]:
+                report = self.memory_report()
+                print(f"[INFO] Rendered {report['pages-rendered']} pages, "
+                      f"{report['pages-downscaled']} below {self.__dpi} dpi "
+                      f"(lowest {report['lowest-dpi']}), peak RSS {report['peak-rss-mb']} MB per process")
+
+    def __track_memory(self, result: dict | None) -> None:
+        if result is None:
+            return
+        memory = self.__memory
+        memory["pages-rendered"] += 1
+        dpi = result.get("render-dpi", self.__dpi)
+        if dpi < self.__dpi:
+            memory["pages-downscaled"] += 1
+        if memory["lowest-dpi"] is None or dpi < memory["lowest-dpi"]:
+            memory["lowest-dpi"] = dpi
+        memory["peak-rss-bytes"] = max(memory["peak-rss-bytes"], result.get("rss-bytes", 0))
+
+    def memory_report(self) -> dict:
+        """Rendering stats for this document; the peak RSS is the highest
+        seen in any one process (this one, or an OCR worker) while a page of
+        it was being read."""
+        return {**self.__memory, "peak-rss-mb": round(self.__memory["peak-rss-bytes"] / 2**20, 1)}
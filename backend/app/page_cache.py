@@ -0,0 +1,155 @@
+from datetime import datetime, timezone
+from sqlmodel import Session, select, delete, col
+from sqlalchemy.dialects.postgresql import insert
+from app.database import engine
+from app.models import PageResultEntry
+from app import ocr, normalize, llm, summarizer, chunking, page_router, vector_db
+import hashlib
+import json
+import os
+import threading
+
+# Reuse OCR text, analysis and summaries of pages already seen in an
+# earlier upload (e.g. the unchanged pages of a revised circular)
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "1") != "0"
+PAGE_CACHE_MAX_ROWS = int(os.getenv("PAGE_CACHE_MAX_ROWS", "500000"))
+# Trim the table after this many documents rather than after every one
+PAGE_CACHE_EVICT_EVERY = 20
+
+_stores = 0
+_stores_lock = threading.Lock()
+
+
+def page_cache_key(fingerprint: str) -> str:
+    """Key a page fingerprint by every setting that shapes its results."""
+    payload = json.dumps({
+        "fingerprint": fingerprint,
+        "ocr": [ocr.OCR_DPI, ocr.OCR_LANG, ocr.USE_TEXT_LAYER, ocr.TEXT_LAYER_MIN_CHARS,
+                ocr.OCR_RENDER_MODE, ocr.OCR_MAX_PIXELS, ocr.OCR_MIN_DPI],
+        "min_conf": normalize.OCR_MIN_CONF,
+        "mode": llm.LLM_PIPELINE_MODE,
+        # which pages share an LLM call, and which pages get one at all
+        "chunk_tokens": chunking.LLM_CHUNK_TOKENS,
+        "router": [page_router.PAGE_ROUTER_MODE, page_router.PAGE_ROUTER_THRESHOLD,
+                   page_router.PAGE_ROUTER_MIN_CHARS, vector_db.EMBEDDING_MODEL],
+        "prompts": [llm.OPENROUTER_MODEL, llm.PROMPT_VERSION, llm.COMBINED_PROMPT_VERSION,
+                    summarizer.OPENROUTER_MODEL, summarizer.PROMPT_VERSION],
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ------------------------------
+# Cached results for a document's pages, by fingerprint
+# ------------------------------
+def load_page_results(fingerprints: list[str]) -> dict[str, dict]:
+    """Return ``{fingerprint: {"text", "extraction-method", "analysis", "summaries"}}``
+    for the pages of a document (``fingerprints``, in page order) whose
+    cached result can be reused, see usable_page_results."""
+    if not PAGE_CACHE_ENABLED or not fingerprints:
+        return {}
+    keys = {page_cache_key(fp): fp for fp in fingerprints}
+    try:
+        with Session(engine) as session:
+            rows = session.exec(select(PageResultEntry).where(
+                col(PageResultEntry.key).in_(list(keys)))).all()
+            now = datetime.now(timezone.utc)
+            results = {}
+            for row in rows:
+                row.hits += 1
+                row.last_used_at = now
+                results[keys[row.key]] = {
+                    "text": row.text,
+                    "extraction-method": row.extraction_method,
+                    "analysis": json.loads(row.analysis),
+                    "summaries": json.loads(row.summaries),
+                }
+            session.commit()
+    except Exception as e:
+        print(f"[WARN] Page cache lookup failed: {e}")
+        return {}
+    return usable_page_results(fingerprints, results)
+
+
+def usable_page_results(fingerprints: list[str], cached: dict[str, dict]) -> dict[str, dict]:
+    """Drop cached pages whose multi-page summaries cannot be replayed whole.
+
+    Every cached summary lists the fingerprints of the pages it came from
+    (``sources``). A page is only reused if all of them are cached pages of
+    this document too, otherwise the summary is re-derived from the current
+    text. Dropping one page can invalidate others, so this repeats until
+    stable. Each kept summary gets ``page-numbers``: the pages of this
+    document it applies to.
+    """
+    usable = dict(cached)
+    while True:
+        stale = [fp for fp, entry in usable.items()
+                 if any(not set(summary.get("sources", [fp])) <= usable.keys()
+                        for summary in entry["summaries"])]
+        if not stale:
+            break
+        for fp in stale:
+            del usable[fp]
+    pages_by_fingerprint: dict[str, list[int]] = {}
+    for n, fp in enumerate(fingerprints, start=1):
+        pages_by_fingerprint.setdefault(fp, []).append(n)
+    for fp, entry in usable.items():
+        usable[fp] = {**entry, "summaries": [
+            {**summary, "page-numbers": sorted(n for source in summary.get("sources", [fp])
+                                              for n in pages_by_fingerprint[source])}
+            for summary in entry["summaries"]]}
+    if len(usable) < len(cached):
+        print(f"[INFO] {len(cached) - len(usable)} cached pages share a topic with changed pages, re-reading them")
+    return usable
+
+
+def store_page_results(entries: dict[str, dict]) -> None:
+    """Upsert ``{fingerprint: {"text", "extraction-method", "analysis", "summaries"}}``.
+
+    Each summary carries ``sources``, the fingerprints of every page it was
+    derived from (see usable_page_results).
+    """
+    if not PAGE_CACHE_ENABLED or not entries:
+        return
+    rows = [{
+        "key": page_cache_key(fp),
+        "text": entry["text"],
+        "extraction_method": entry.get("extraction-method"),
+        "analysis": json.dumps(entry.get("analysis", [])),
+        "summaries": json.dumps(entry.get("summaries", [])),
+    } for fp, entry in entries.items()]
+    try:
+        with Session(engine) as session:
+            stmt = insert(PageResultEntry).values(rows)
+            session.exec(stmt.on_conflict_do_update(index_elements=["key"], set_={
+                "text": stmt.excluded.text,
+                "extraction_method": stmt.excluded.extraction_method,
+                "analysis": stmt.excluded.analysis,
+                "summaries": stmt.excluded.summaries,
+                "last_used_at": datetime.now(timezone.utc),
+            }))
+            session.commit()
+    except Exception as e:
+        print(f"[WARN] Page cache store failed: {e}")
+        return
+
+    global _stores
+    with _stores_lock:
+        _stores += 1
+        evict = _stores % PAGE_CACHE_EVICT_EVERY == 0
+    if evict:
+        evict_page_results()
+
+
+def evict_page_results() -> int:
+    """Trim the cache to PAGE_CACHE_MAX_ROWS, least recently used first."""
+    try:
+        with Session(engine) as session:
+            keep = select(PageResultEntry.key).order_by(
+                col(PageResultEntry.last_used_at).desc()).limit(PAGE_CACHE_MAX_ROWS)
+            result = session.exec(delete(PageResultEntry).where(
+                col(PageResultEntry.key).not_in(keep)))
+            session.commit()
+            return result.rowcount or 0
+    except Exception as e:
+        print(f"[WARN] Page cache eviction failed: {e}")
+        return 0
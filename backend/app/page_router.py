@@ -0,0 +1,114 @@
+from typing import Callable, Iterable, Iterator, Optional
+import os
+import threading
+import numpy as np
+from app.department import departments
+from app.vector_db import embed_texts
+
+# "enforce": pages scoring below the threshold skip the analysis LLM call.
+# "shadow": every page goes to the LLM; scores are only recorded, to tune
+# the threshold against the LLM's labels. "off": no routing.
+PAGE_ROUTER_MODE = os.getenv("PAGE_ROUTER_MODE", "enforce")
+# Best cosine similarity between a page and any department description
+PAGE_ROUTER_THRESHOLD = float(os.getenv("PAGE_ROUTER_THRESHOLD", "0.12"))
+# Pages embedded per model.encode call. The first batches are smaller (1, 2,
+# 4, ...) so the first page reaches the LLM without waiting for a full batch
+PAGE_ROUTER_BATCH = int(os.getenv("PAGE_ROUTER_BATCH", "16"))
+# Pages with fewer characters are scored 0 without embedding
+PAGE_ROUTER_MIN_CHARS = 40
+# Width of the score buckets reported by router_stats()
+SCORE_BUCKET = 0.05
+
+_department_matrix: Optional[np.ndarray] = None
+_matrix_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"routed": 0, "skipped": 0}
+# score bucket -> [pages the LLM found topics on, pages it found none on]
+_calibration: dict[float, list[int]] = {}
+
+
+def _normalize(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def department_matrix() -> np.ndarray:
+    """Unit-length department embeddings, one row per department, built once."""
+    global _department_matrix
+    with _matrix_lock:
+        if _department_matrix is None:
+            texts = [f"{d['title']}. {d['description']}" for d in departments]
+            _department_matrix = _normalize(embed_texts(texts))
+        return _department_matrix
+
+
+def score_pages(texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Best cosine score per page and the index of the department it came from."""
+    scores = np.zeros(len(texts), dtype=np.float32)
+    best = np.full(len(texts), -1, dtype=np.int64)
+    wanted = [i for i, text in enumerate(texts)
+              if len(text.strip()) >= PAGE_ROUTER_MIN_CHARS]
+    if wanted:
+        pages = _normalize(embed_texts([texts[i] for i in wanted]))
+        similarity = pages @ department_matrix().T
+        scores[wanted] = similarity.max(axis=1)
+        best[wanted] = similarity.argmax(axis=1)
+    return scores, best
+
+
+def route_pages(pages: Iterable[dict], on_skip: Callable[[dict], None],
+                mode: str = PAGE_ROUTER_MODE, threshold: float = PAGE_ROUTER_THRESHOLD,
+                batch: int = PAGE_ROUTER_BATCH) -> Iterator[dict]:
+    """Score pages in batches and yield those that should go to the LLM.
+
+    Each page gets ``route-score`` and ``route-department``; pages below
+    ``threshold`` are handed to ``on_skip`` instead (enforce mode only).
+    Batches start at one page and double up to ``batch``.
+    """
+    if mode == "off":
+        yield from pages
+        return
+
+    def flush(buffer: list[dict]) -> Iterator[dict]:
+        scores, best = score_pages([page["text"] for page in buffer])
+        for page, score, index in zip(buffer, scores, best):
+            page["route-score"] = float(score)
+            page["route-department"] = departments[index]["title"] if index >= 0 else None
+            skip = mode == "enforce" and score < threshold
+            with _stats_lock:
+                _stats["skipped" if skip else "routed"] += 1
+            if skip:
+                on_skip(page)
+            else:
+                yield page
+
+    buffer: list[dict] = []
+    size = 1
+    for page in pages:
+        buffer.append(page)
+        if len(buffer) >= size:
+            yield from flush(buffer)
+            buffer = []
+            size = min(2 * size, batch)
+    if buffer:
+        yield from flush(buffer)
+
+
+def record_label(score: float, has_topics: bool) -> None:
+    """Record the LLM's verdict on a routed page against its router score."""
+    bucket = round(float(np.floor(score / SCORE_BUCKET)) * SCORE_BUCKET, 2)
+    with _stats_lock:
+        counts = _calibration.setdefault(bucket, [0, 0])
+        counts[0 if has_topics else 1] += 1
+
+
+def router_stats() -> dict:
+    """Routing counts plus, per score bucket, how many routed pages the LLM
+    did and did not find topics on; pick the threshold below the buckets
+    that still hold relevant pages."""
+    with _stats_lock:
+        calibration = [{"score_from": bucket, "with_topics": counts[0], "without_topics": counts[1]}
+                       for bucket, counts in sorted(_calibration.items())]
+        return {"mode": PAGE_ROUTER_MODE, "threshold": PAGE_ROUTER_THRESHOLD,
+                **_stats, "calibration": calibration}
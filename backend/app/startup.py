@@ -0,0 +1,97 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Optional
+import threading
+import time
+
+
+class StartupError(RuntimeError):
+    pass
+
+
+class WarmUp:
+    """Named startup steps run in parallel threads.
+
+    A step starts as soon as the steps listed in ``after`` are ready; if one
+    of them fails the step is skipped. ``status()`` is what ``/ready``
+    reports.
+    """
+
+    def __init__(self):
+        self._steps: dict[str, dict] = {}
+        self._done: dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._started_at: Optional[float] = None
+
+    def add(self, name: str, fn: Callable[..., Any], after: Iterable[str] = ()) -> None:
+        """``fn`` receives the results of its ``after`` steps as keyword arguments."""
+        self._steps[name] = {"fn": fn, "after": tuple(after), "state": "pending",
+                             "seconds": None, "error": None, "result": None}
+        self._done[name] = threading.Event()
+
+    def start(self) -> None:
+        self._started_at = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self._steps)),
+                                            thread_name_prefix="warmup")
+        for name in self._steps:
+            self._executor.submit(self._run, name)
+        self._executor.shutdown(wait=False)
+
+    def _run(self, name: str) -> None:
+        step = self._steps[name]
+        kwargs = {}
+        for dep in step["after"]:
+            self._done[dep].wait()
+            if self._steps[dep]["state"] != "ready":
+                self._finish(name, "skipped", error=f"{dep} did not start")
+                return
+            kwargs[dep] = self._steps[dep]["result"]
+
+        with self._lock:
+            step["state"] = "running"
+        started = time.perf_counter()
+        try:
+            result = step["fn"](**kwargs)
+        except Exception as e:
+            print(f"[ERROR] Startup step {name} failed: {e}")
+            self._finish(name, "failed", started, error=str(e))
+            return
+        self._finish(name, "ready", started, result=result)
+
+    def _finish(self, name: str, state: str, started: Optional[float] = None,
+                error: Optional[str] = None, result: Any = None) -> None:
+        step = self._steps[name]
+        with self._lock:
+            step["state"] = state
+            step["error"] = error
+            step["result"] = result
+            if started is not None:
+                step["seconds"] = round(time.perf_counter() - started, 3)
+        if state == "ready":
+            print(f"[INFO] {name} ready in {step['seconds']:.2f}s")
+        self._done[name].set()
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> Any:
+        """Block until ``name`` has finished and return its result."""
+        if not self._done[name].wait(timeout):
+            raise StartupError(f"{name} still warming up")
+        step = self._steps[name]
+        if step["state"] != "ready":
+            raise StartupError(f"{name} {step['state']}: {step['error']}")
+        return step["result"]
+
+    @property
+    def ready(self) -> bool:
+        return all(step["state"] == "ready" for step in self._steps.values())
+
+    def status(self) -> dict:
+        with self._lock:
+            steps = {name: {"state": step["state"], "seconds": step["seconds"],
+                            "error": step["error"]}
+                     for name, step in self._steps.items()}
+        return {
+            "ready": all(step["state"] == "ready" for step in steps.values()),
+            "uptime_seconds": (round(time.monotonic() - self._started_at, 3)
+                               if self._started_at is not None else None),
+            "steps": steps,
+        }
@@ -1,20 +1,16 @@
-from pydantic import BaseModel, Field, SecretStr
-from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, Field
 from langchain.prompts import ChatPromptTemplate
 from langchain.output_parsers import PydanticOutputParser
-import os
-from dotenv import load_dotenv
 from app.vector_db import *
 from datetime import date
 from app.models import SummarizedContent
-from app.database import get_session
+from app.crud import bulk_insert_summarized_content
 from app.department import get_department_by_name
+from app.llm_cache import CachedChain
+from app.clients import OPENROUTER_MODEL, get_chat_model
 
-load_dotenv()
-
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY") or ""
-OPENAI_API_BASE = "https://openrouter.ai/api/v1"
-OPENROUTER_MODEL = "openai/gpt-5-nano"
+# Part of the LLM cache key: bump whenever the prompt or schema changes
+PROMPT_VERSION = "summary-v1"
 
 
 class SummarizedContentSchema(BaseModel):
@@ -51,20 +47,15 @@ prompt = ChatPromptTemplate.from_messages([
     )
 ])
 
-llm = ChatOpenAI(
-    model=OPENROUTER_MODEL,
-    max_retries=2,
-    api_key=SecretStr(OPENROUTER_API_KEY),
-    base_url=OPENAI_API_BASE,
-    temperature=0,
-)
-
-chain = prompt | llm | parser
+# same client as the analysis chain, deterministic sampling
+llm = get_chat_model().bind(temperature=0)
 
+chain = CachedChain(prompt | llm | parser, schema=SummarizedContentSchema,
+                    name="summary", model=OPENROUTER_MODEL, prompt_version=PROMPT_VERSION)
 
-def summarize_and_store(upload_id: int, action_line: str, content: str, department_name: str, topic_name: str, vector_index, source_file: str | None = None) -> SummarizedContent:
-    session = next(get_session())
 
+def summarize_topic(action_line: str, content: str, department_name: str) -> tuple[dict, SummarizedContentSchema]:
+    """Run the summary chain for one topic; no vector or DB work."""
     department = get_department_by_name(department_name)
     if not department:
         raise ValueError("Nope")
@@ -79,26 +70,77 @@ def summarize_and_store(upload_id: int, action_line: str, content: str, departme
 
     summary: SummarizedContentSchema = result
     print(summary.model_dump_json(indent=2))
+    return department, summary
 
-    fetch_results = get_vector_data(vector_index, summary.description, 6)
-    fetch_tags = [output["tag"] for output in fetch_results]
-    print(f"Related Tags :{fetch_tags}")
-    vec_data_id = upsert_vector_data(index=vector_index, topic_data=topic_name,
-                                     summarized_data=summary.description, department_name=department["name"], doc_name=source_file)
-    print(f"{vec_data_id} stored in VDB")
-
-    obj = SummarizedContent(
-        title=summary.title,
-        description=summary.description,
-        upload_id=upload_id,
-        department=department["name"],
-        tags=",".join(fetch_tags)
-    )
-    session.add(obj)
-    session.commit()
-    session.refresh(obj)
 
-    return obj
+def summary_from_analysis(analysis: dict) -> tuple[dict, SummarizedContentSchema]:
+    """Single-pass results already carry Title and Description."""
+    department = get_department_by_name(analysis["Department_Name"])
+    if not department:
+        raise ValueError(f"Unknown department {analysis['Department_Name']}")
+
+    return department, SummarizedContentSchema(
+        title=analysis["Title"], description=analysis["Description"])
+
+
+def store_summaries(upload_id: int, items: list[tuple[dict, SummarizedContentSchema, str, list[int]]], vector_index,
+                    source_file: str | None = None) -> list[SummarizedContent]:
+    """Tag, index and persist summaries: ``items`` are (department, summary, topic, pages).
+
+    All topics and summaries are embedded in one call, related tags are looked
+    up as one batch before any of the items is indexed, and the new vectors go
+    out in chunked bulk upserts.
+    """
+    if not items:
+        return []
+
+    embed_texts([topic for _, _, topic, _ in items] +
+                [summary.description for _, summary, _, _ in items])
+    related = get_vector_data_batch(
+        vector_index, [summary.description for _, summary, _, _ in items], 6)
+    records = [build_vector_record(topic, summary.description, department["name"], source_file)
+               for department, summary, topic, _ in items]
+    vec_data_ids = upsert_vector_data_batch(vector_index, records)
+    print(f"{len(vec_data_ids)} vectors stored in VDB")
+
+    objs = []
+    for (department, summary, _, page_numbers), fetch_results in zip(items, related):
+        fetch_tags = [output["tag"] for output in fetch_results]
+        print(f"Related Tags :{fetch_tags}")
+        objs.append(SummarizedContent(
+            title=summary.title,
+            description=summary.description,
+            upload_id=upload_id,
+            department=department["name"],
+            tags=",".join(fetch_tags),
+            page_numbers=page_numbers or []
+        ))
+    return bulk_insert_summarized_content(objs)
+
+
+def store_cached_summaries(upload_id: int, pages: list[dict],
+                           seen: set | None = None) -> list[SummarizedContent]:
+    """Persist the cached summaries of reused pages for a new upload.
+
+    ``pages`` are extract_data page dicts with a ``cached`` entry, as
+    returned by load_page_results. A summary that spanned several pages is
+    stored once with all their current page numbers; pass the same ``seen``
+    set for every batch of a job so it is not stored again when its pages
+    arrive in different batches. Nothing is embedded or indexed again.
+    """
+    seen = set() if seen is None else seen
+    new: list[tuple] = []
+    for page in pages:
+        for cached in page["cached"]["summaries"]:
+            key = (cached["title"], cached["description"], cached["department"], cached["tags"],
+                   tuple(cached.get("page-numbers", [page["page-number"]])))
+            if key not in seen:
+                seen.add(key)
+                new.append(key)
+    return bulk_insert_summarized_content([
+        SummarizedContent(title=title, description=description, upload_id=upload_id,
+                          department=department, tags=tags, page_numbers=list(page_numbers))
+        for title, description, department, tags, page_numbers in new])
 
 
 # print(result.model_dump_json(indent=2))
@@ -0,0 +1,102 @@
+from typing import BinaryIO
+import hashlib
+import os
+import tempfile
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+# Uploads larger than this are rejected while streaming
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Room for the multipart boundaries and the other form fields of a request
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def content_path(folder: str, digest: str, suffix: str = ".pdf") -> str:
+    # two-level fan-out keeps directories small
+    return os.path.join(folder, digest[:2], digest + suffix)
+
+
+# ------------------------------
+# Stream an upload to disk, hashing it on the way
+# ------------------------------
+def save_upload(fileobj: BinaryIO, folder: str, max_bytes: int = UPLOAD_MAX_BYTES) -> tuple[str, str, int]:
+    """Store ``fileobj`` under its SHA-256 and return ``(path, digest, size)``.
+
+    The file is written in UPLOAD_CHUNK_BYTES pieces to a temporary file in
+    ``folder`` and moved into place once complete, so a reader never sees a
+    partial file. Identical content maps to the same path and is stored once.
+    Raises UploadTooLarge as soon as ``max_bytes`` is exceeded.
+    """
+    os.makedirs(folder, exist_ok=True)
+    sha = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := fileobj.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(
+                        f"Upload exceeds the {max_bytes} byte limit")
+                sha.update(chunk)
+                out.write(chunk)
+        digest = sha.hexdigest()
+        path = content_path(folder, digest)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        return path, digest, size
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# ------------------------------
+# Reject oversized request bodies before Starlette spools them
+# ------------------------------
+class UploadLimitMiddleware:
+    """ASGI middleware capping the request body of ``paths``.
+
+    Starlette parses the whole multipart body into a spooled temp file before
+    the endpoint runs, so save_upload's limit alone still lets an oversized
+    upload be received and written once. A ``Content-Length`` over the limit
+    is answered with 413 straight away; a body without one (chunked) is
+    counted as it arrives and cut off at the limit.
+    """
+
+    def __init__(self, app, paths: tuple[str, ...],
+                 max_bytes: int = UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD):
+        self.app = app
+        self.paths = paths
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.max_bytes or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        detail = f"Upload exceeds the {self.max_bytes - UPLOAD_FORM_OVERHEAD} byte limit"
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
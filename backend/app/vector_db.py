@@ -1,20 +1,140 @@
 from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import random
+import numpy as np
+import hashlib
+import threading
 import os
 from datetime import date
+from app.local_vector_store import LocalVectorIndex, get_local_index, has_local_index
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
 VECTOR_API_KEY = os.getenv("PINECONE_API_KEY")
-model = SentenceTransformer('all-MiniLM-L6-v2')
-pc = Pinecone(api_key=VECTOR_API_KEY)
+# "pinecone" (serverless, us-east-1) or "local" (app.local_vector_store,
+# needs no network access)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+# A local path works too, for air-gapped deployments
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_DIM = 384
+
+# Embeddings kept in memory, keyed by a hash of the text
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# Related-tag matches below this cosine score are ignored
+TAG_MIN_SCORE = 0.65
+# Bulk path: vectors per upsert request and parallel Pinecone requests
+VECTOR_UPSERT_BATCH = int(os.getenv("VECTOR_UPSERT_BATCH", "100"))
+VECTOR_IO_WORKERS = int(os.getenv("VECTOR_IO_WORKERS", "4"))
+# Ids fetched back after a delete to verify it; 0 skips verification
+VECTOR_DELETE_VERIFY_SAMPLE = int(
+    os.getenv("VECTOR_DELETE_VERIFY_SAMPLE", "0"))
+
+_vector_io = ThreadPoolExecutor(
+    max_workers=max(1, VECTOR_IO_WORKERS), thread_name_prefix="vector-io")
+
+_embedding_cache: OrderedDict[str, np.ndarray] = OrderedDict()
+_embedding_lock = threading.Lock()
+embedding_stats = {"hits": 0, "misses": 0, "encode_calls": 0}
+
+# The model (torch import plus weights) and the Pinecone client are built on
+# first use, so importing this module stays cheap. Each has its own lock:
+# a slow model load must not hold up the Pinecone client (see app.startup)
+_model = None
+_pinecone = None
+_model_lock = threading.Lock()
+_pinecone_lock = threading.Lock()
+
+
+def get_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            from sentence_transformers import SentenceTransformer
+            _model = SentenceTransformer(EMBEDDING_MODEL)
+        return _model
+
+
+def get_pinecone():
+    global _pinecone
+    with _pinecone_lock:
+        if _pinecone is None:
+            from pinecone import Pinecone
+            _pinecone = Pinecone(api_key=VECTOR_API_KEY)
+        return _pinecone
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ------------------------------
+# Batched, cached embeddings
+# ------------------------------
+def embed_texts(texts: list[str]) -> list[np.ndarray]:
+    """Embed many texts with at most one model.encode call for the cache misses.
+
+    Vectors are read-only float32 arrays; convert with ``.tolist()`` only
+    where an API needs plain lists (Pinecone).
+    """
+    keys = [_text_key(text) for text in texts]
+    found: dict[str, np.ndarray] = {}
+    missing: dict[str, str] = {}
+    with _embedding_lock:
+        for key, text in zip(keys, texts):
+            if key in found or key in missing:
+                continue
+            vector = _embedding_cache.get(key)
+            if vector is not None:
+                _embedding_cache.move_to_end(key)
+                found[key] = vector
+                embedding_stats["hits"] += 1
+            else:
+                missing[key] = text
+                embedding_stats["misses"] += 1
+
+    if missing:
+        vectors = get_model().encode(list(missing.values()),
+                                     batch_size=EMBEDDING_BATCH_SIZE)
+        with _embedding_lock:
+            embedding_stats["encode_calls"] += 1
+            for key, vector in zip(missing, vectors):
+                # own copy per row, so evicting one does not pin the whole batch
+                vector = np.array(vector, dtype=np.float32)
+                vector.setflags(write=False)
+                found[key] = _embedding_cache[key] = vector
+                _embedding_cache.move_to_end(key)
+            while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+                _embedding_cache.popitem(last=False)
+    return [found[key] for key in keys]
+
+
+def embed_text(text: str) -> np.ndarray:
+    return embed_texts([text])[0]
+
+
+def _as_list(vector) -> list[float]:
+    return vector.tolist() if isinstance(vector, np.ndarray) else vector
+
+
+def _pinecone_records(records: list[dict]) -> list[dict]:
+    return [{**record, "values": _as_list(record["values"])} for record in records]
 
 
 def create_index(index_name: str) -> None:
+    if VECTOR_BACKEND == "local":
+        if not has_local_index(index_name):
+            get_local_index(index_name, EMBEDDING_DIM)
+            print("Created Vector DB")
+        else:
+            print("DB already exists!")
+        return
+
+    pc = get_pinecone()
     if not pc.has_index(index_name):
         pc.create_index(
             name=index_name,
-            dimension=384,
+            dimension=EMBEDDING_DIM,
             metric='cosine',
             spec={
                 "serverless": {
@@ -29,52 +149,75 @@ def create_index(index_name: str) -> None:
 
 
 def connect_db(index_name: str):
-    vector_index = pc.Index(index_name)
+    if VECTOR_BACKEND == "local":
+        vector_index = get_local_index(index_name, EMBEDDING_DIM)
+    else:
+        vector_index = get_pinecone().Index(index_name)
     print("Connected to VECTOR INDEX")
     return vector_index
 
 
+def build_vector_record(topic_data: str, summarized_data: str, department_name: str, doc_name: str | None = None,
+                        values: np.ndarray | None = None) -> dict:
+    return {
+        "id": f"{date.today()}-{topic_data}-{department_name}",
+        "values": values if values is not None else embed_text(topic_data),
+        "metadata": {
+            "topic-name": topic_data,
+            "chunk-text": summarized_data,
+            "source": doc_name,
+            "date": date.today().isoformat()
+        }
+    }
+
+
 def upsert_vector_data(index, topic_data: str, summarized_data: str, department_name: str, doc_name: str | None = None) -> str:
 
-    embedded_vector_data = model.encode(topic_data).tolist()
-    index.upsert(
-        vectors=[{
-            "id": f"{date.today()}-{topic_data}-{department_name}",
-            "values": embedded_vector_data,
-            "metadata": {
-                "topic-name": topic_data,
-                "chunk-text": summarized_data,
-                "source": doc_name,
-                "date": date.today().isoformat()
-            }
-        }
-        ])
+    record = build_vector_record(
+        topic_data, summarized_data, department_name, doc_name)
+    if isinstance(index, LocalVectorIndex):
+        index.upsert(vectors=[record])
+    else:
+        index.upsert(vectors=_pinecone_records([record]))
     print("Successfully inserted vector data!")
-    return id
+    return record["id"]
+
+
+def upsert_vector_data_batch(index, records: list[dict], batch_size: int = VECTOR_UPSERT_BATCH) -> list[str]:
+    """Upsert many records: one call for the local store, parallel chunks for Pinecone."""
+    if not records:
+        return []
+    if isinstance(index, LocalVectorIndex):
+        index.upsert(vectors=records)
+    else:
+        pinecone_records = _pinecone_records(records)
+        batches = [pinecone_records[i:i + batch_size]
+                   for i in range(0, len(pinecone_records), batch_size)]
+        for future in [_vector_io.submit(index.upsert, vectors=batch) for batch in batches]:
+            future.result()
+    print(f"Successfully inserted {len(records)} vectors!")
+    return [record["id"] for record in records]
 
 
-def delete_vector_data(index, list_of_ids: list[str]):
+def delete_vector_data(index, list_of_ids: list[str], verify_sample: int = VECTOR_DELETE_VERIFY_SAMPLE):
 
     index.delete(ids=list_of_ids)
+    if verify_sample <= 0:
+        return
     print("Verifying deletion...")
-    fetch_response = index.fetch(ids=list_of_ids)
+    sample = random.sample(list_of_ids, min(verify_sample, len(list_of_ids)))
+    fetch_response = index.fetch(ids=sample)
     if not fetch_response.get('vectors'):
         print(
-            f"Verification successful: Vector '{list_of_ids[0]}' no longer exists.")
+            f"Verification successful: {len(sample)} sampled vectors no longer exist.")
     else:
         print("Verification failed. Vector still exists.")
 
 
-def get_vector_data(index, query: str, k: int) -> list[dict]:
+def _related_tags(result) -> list[dict]:
     response = []
-    query_vector = model.encode(query).tolist()
-    result = index.query(
-        vector=query_vector,
-        top_k=k,
-        include_metadata=True
-    )
     for match in result["matches"]:
-        if match["score"] > 0.65:
+        if match["score"] > TAG_MIN_SCORE:
             response.append({
                 "score": match["score"],
                 "tag": match["metadata"]["topic-name"],
@@ -83,3 +226,27 @@ def get_vector_data(index, query: str, k: int) -> list[dict]:
                 "source": match["metadata"]["source"]
             })
     return response
+
+
+def get_vector_data(index, query: str, k: int) -> list[dict]:
+    query_vector = embed_text(query)
+    result = index.query(
+        vector=query_vector if isinstance(index, LocalVectorIndex) else query_vector.tolist(),
+        top_k=k,
+        include_metadata=True
+    )
+    return _related_tags(result)
+
+
+def get_vector_data_batch(index, queries: list[str], k: int) -> list[list[dict]]:
+    """Related tags for many queries: one encode call, one pass or parallel queries."""
+    if not queries:
+        return []
+    query_vectors = embed_texts(queries)
+    if isinstance(index, LocalVectorIndex):
+        results = index.query_many(query_vectors, top_k=k, include_metadata=True)
+    else:
+        futures = [_vector_io.submit(index.query, vector=vector.tolist(), top_k=k, include_metadata=True)
+                   for vector in query_vectors]
+        results = [future.result() for future in futures]
+    return [_related_tags(result) for result in results]
@@ -0,0 +1,65 @@
+"""Import-time budget for the API module.
+
+Imports ``app.main`` in fresh interpreters and fails (exit code 1) when the
+median wall time exceeds the budget, or when a module that must load lazily
+(torch, sentence_transformers, pinecone) was pulled in by the import.
+Startup work itself runs in the lifespan, see ``GET /ready``.
+
+Run from backend/:  python -m benchmarks.import_time [--budget 3.0] [--repeats 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MODULE = "app.main"
+LAZY_MODULES = ["torch", "sentence_transformers", "pinecone"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed,
+                  "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str) -> dict:
+    code = PROBE.format(module=module, lazy=LAZY_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if out.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(budget: float, repeats: int) -> int:
+    runs = [measure(MODULE) for _ in range(repeats)]
+    seconds = [run["seconds"] for run in runs]
+    median = statistics.median(seconds)
+    loaded = sorted({m for run in runs for m in run["loaded"]})
+    print(f"import {MODULE}: median {median:.2f}s, min {min(seconds):.2f}s, "
+          f"max {max(seconds):.2f}s over {repeats} runs (budget {budget:.2f}s)")
+
+    failed = False
+    if median > budget:
+        print(f"FAIL: over budget by {median - budget:.2f}s")
+        failed = True
+    if loaded:
+        print(f"FAIL: loaded at import time: {', '.join(loaded)}")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget", type=float,
+                    default=float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", "3.0")))
+    ap.add_argument("--repeats", type=int, default=5)
+    args = ap.parse_args()
+    sys.exit(main(args.budget, args.repeats))
@@ -0,0 +1,88 @@
+"""Compare the two-stage (analysis + per-topic summary) and single-pass LLM modes.
+
+Calls the live model, bypassing the response cache. Needs OPENROUTER_API_KEY.
+Run from backend/:  python -m benchmarks.llm_modes [file.pdf ...] [--pages N]
+"""
+import argparse
+import glob
+import os
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from app.ocr import OCR_Manager
+from app.department import get_department_by_name
+from app import llm, summarizer
+
+
+class UsageCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        self.calls += 1
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        self.prompt_tokens += usage.get("prompt_tokens", 0) or 0
+        self.completion_tokens += usage.get("completion_tokens", 0) or 0
+
+
+def run_two_stage(pages: list[str], counter: UsageCounter) -> int:
+    config = {"callbacks": [counter]}
+    notes = 0
+    for text in pages:
+        analysis = llm.chain.chain.invoke({
+            "text": text,
+            "format_instructions": llm.parser.get_format_instructions()
+        }, config=config)
+        for result in analysis.analysis_results:
+            department = get_department_by_name(result.Department_Name)
+            if not department:
+                continue
+            summarizer.chain.chain.invoke({
+                "action_line": result.Topic_Name,
+                "extracted_content": text,
+                "department": department["title"],
+                "department_desc": department["description"],
+                "format_instructions": summarizer.parser.get_format_instructions()
+            }, config=config)
+            notes += 1
+    return notes
+
+
+def run_single_pass(pages: list[str], counter: UsageCounter) -> int:
+    chain, fixed_inputs = llm.get_analysis_chain("single-pass")
+    notes = 0
+    for text in pages:
+        result = chain.chain.invoke({"text": text, **fixed_inputs},
+                                    config={"callbacks": [counter]})
+        notes += len(result.analysis_results)
+    return notes
+
+
+def bench(pdf_paths: list[str], max_pages: int) -> None:
+    pages: list[str] = []
+    for path in pdf_paths:
+        for page in (OCR_Manager(path).process_doc() or [])[:max_pages]:
+            if page:
+                pages.append(" ".join(page["content"]))
+    print(f"{len(pages)} pages")
+
+    print(f"{'mode':12s} {'calls':>6s} {'prompt tok':>11s} {'output tok':>11s} {'latency s':>10s} {'notes':>6s}")
+    for name, runner in (("two-stage", run_two_stage), ("single-pass", run_single_pass)):
+        counter = UsageCounter()
+        start = time.perf_counter()
+        notes = runner(pages, counter)
+        elapsed = time.perf_counter() - start
+        print(f"{name:12s} {counter.calls:6d} {counter.prompt_tokens:11d} "
+              f"{counter.completion_tokens:11d} {elapsed:10.1f} {notes:6d}")
+
+
+if __name__ == "__main__":
+    default_pdfs = sorted(glob.glob(os.path.join(
+        os.path.dirname(__file__), "..", "test_data", "*.pdf")))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pdfs", nargs="*", default=default_pdfs)
+    ap.add_argument("--pages", type=int, default=2,
+                    help="pages per document")
+    args = ap.parse_args()
+    bench(args.pdfs, args.pages)
@@ -0,0 +1,63 @@
+"""Compare the pytesseract subprocess backend with the pooled tesserocr engine.
+
+Run from backend/:  python -m benchmarks.ocr_backends [file.pdf ...] [--pages N]
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+import fitz
+from app.ocr import OCR_DPI, PytesseractBackend, TesserocrPoolBackend, _render_page
+
+
+def _words(data: dict) -> list[str]:
+    return [w for w in data["text"] if w.strip()]
+
+
+def bench(pdf_paths: list[str], max_pages: int, repeats: int) -> None:
+    images = []
+    for path in pdf_paths:
+        with fitz.open(path) as doc:
+            for page in list(doc)[:max_pages]:
+                images.append((f"{os.path.basename(path)}#{page.number + 1}",
+                               _render_page(page, OCR_DPI).copy()))
+    print(f"{len(images)} pages rendered at {OCR_DPI} dpi")
+
+    backends = [PytesseractBackend()]
+    try:
+        backends.append(TesserocrPoolBackend())
+    except RuntimeError as e:
+        print(f"[WARN] tesserocr backend unavailable: {e}")
+
+    outputs: dict[str, list[list[str]]] = {}
+    for backend in backends:
+        # first page once as warm-up so engine start-up is not in the timings
+        backend.image_to_data(images[0][1])
+        timings = []
+        outputs[backend.name] = []
+        for _, image in images:
+            for _ in range(repeats):
+                start = time.perf_counter()
+                data = backend.image_to_data(image)
+                timings.append(time.perf_counter() - start)
+            outputs[backend.name].append(_words(data))
+        print(f"{backend.name:12s} mean {statistics.mean(timings) * 1000:8.1f} ms/page"
+              f"  median {statistics.median(timings) * 1000:8.1f} ms"
+              f"  total {sum(timings):6.2f} s")
+
+    if len(outputs) == 2:
+        same = sum(a == b for a, b in zip(*outputs.values()))
+        print(f"identical word output on {same}/{len(images)} pages")
+
+
+if __name__ == "__main__":
+    default_pdfs = sorted(glob.glob(os.path.join(
+        os.path.dirname(__file__), "..", "test_data", "*.pdf")))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pdfs", nargs="*", default=default_pdfs)
+    ap.add_argument("--pages", type=int, default=3,
+                    help="pages per document")
+    ap.add_argument("--repeats", type=int, default=3)
+    args = ap.parse_args()
+    bench(args.pdfs, args.pages, args.repeats)
@@ -0,0 +1,84 @@
+"""OCR accuracy versus memory for the full (RGB) and bounded (grayscale,
+pixel-budget) rendering modes.
+
+Every configuration runs in a fresh interpreter so its peak RSS is its own.
+Born-digital pages are OCR'd anyway and scored against their text layer:
+accuracy is the word-sequence similarity (difflib ratio) of OCR output and
+embedded text.
+
+Run from backend/:  python -m benchmarks.ocr_memory [file.pdf ...] [--pages N]
+                    [--budgets 12000000 4000000]
+"""
+import argparse
+import difflib
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import fitz
+from app import ocr
+
+
+def run_config(pdf_paths: list[str], max_pages: int, mode: str, max_pixels: int) -> dict:
+    ocr.OCR_RENDER_MODE = mode
+    ocr.OCR_MAX_PIXELS = max_pixels
+    backend = ocr.get_ocr_backend()
+    ratios, dpis, seconds = [], [], 0.0
+    for path in pdf_paths:
+        with fitz.open(path) as doc:
+            for page in list(doc)[:max_pages]:
+                truth = [w[4] for w in sorted(page.get_text("words"),
+                                              key=lambda w: (w[5], w[6], w[7]))]
+                if not truth:
+                    continue
+                start = time.perf_counter()
+                image, dpi = ocr.render_for_ocr(page)
+                data = backend.image_to_data(image)
+                seconds += time.perf_counter() - start
+                words = [w for w in data["text"] if w.strip()]
+                ratios.append(difflib.SequenceMatcher(None, truth, words, autojunk=False).ratio())
+                dpis.append(dpi)
+    # ru_maxrss is kB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"pages": len(ratios), "accuracy": sum(ratios) / max(len(ratios), 1),
+            "min_dpi": min(dpis, default=None), "seconds": seconds, "peak_rss_mb": peak}
+
+
+def bench(pdf_paths: list[str], max_pages: int, budgets: list[int]) -> None:
+    configs = [("full", 0)] + [("bounded", budget) for budget in budgets]
+    print(f"{'mode':8s} {'max pixels':>11s} {'pages':>5s} {'min dpi':>7s} "
+          f"{'accuracy':>8s} {'s/page':>7s} {'peak RSS MB':>11s}")
+    for mode, budget in configs:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.ocr_memory", "--child", mode, str(budget),
+             "--pages", str(max_pages), *pdf_paths],
+            capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        if out.returncode != 0:
+            print(f"{mode:8s} failed:\n{out.stderr}")
+            continue
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{mode:8s} {budget or '-':>11} {r['pages']:5d} {r['min_dpi'] or '-':>7} "
+              f"{r['accuracy']:8.3f} {r['seconds'] / max(r['pages'], 1):7.2f} {r['peak_rss_mb']:11.1f}")
+
+
+if __name__ == "__main__":
+    default_pdfs = sorted(glob.glob(os.path.join(
+        os.path.dirname(__file__), "..", "test_data", "*.pdf")))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pdfs", nargs="*", default=default_pdfs)
+    ap.add_argument("--pages", type=int, default=3,
+                    help="pages per document")
+    ap.add_argument("--budgets", type=int, nargs="+",
+                    default=[ocr.OCR_MAX_PIXELS, 4_000_000, 2_000_000],
+                    help="OCR_MAX_PIXELS values to try in bounded mode")
+    ap.add_argument("--child", nargs=2, metavar=("MODE", "MAX_PIXELS"),
+                    help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        print(json.dumps(run_config(args.pdfs, args.pages, args.child[0], int(args.child[1]))))
+    else:
+        bench(args.pdfs, args.pages, args.budgets)
@@ -0,0 +1,110 @@
+"""Calibrate near-duplicate triage: false-negative rate on simulated rescans
+of the same page against false-positive rate on pairs of different pages.
+
+Every page is rendered at 150 dpi. Each copy is put through a simulated
+scanner: a small rotation and shift, blur, a brightness and contrast change,
+and Gaussian noise. Both versions are then downsampled to the 72 dpi
+fingerprint render that triage_pages sees. The test PDFs are supplemented
+with pages that share one letterhead and layout but carry different text,
+which are the hardest negatives.
+
+Run from backend/:  python -m benchmarks.page_triage [file.pdf ...] [--scans N]
+                    [--thresholds 10 20 30]
+"""
+import argparse
+import glob
+import itertools
+import os
+import random
+import fitz
+import numpy as np
+from PIL import Image, ImageFilter
+from app import ocr
+
+RENDER_DPI = 150
+
+
+def _array(pix) -> np.ndarray:
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+
+
+def _same_layout_pages(count: int) -> list[np.ndarray]:
+    doc = fitz.open()
+    for seed in range(count):
+        page = doc.new_page()
+        rng = random.Random(seed)
+        page.insert_text((72, 50), "KOCHI METRO RAIL LIMITED - ANNEXURE", fontsize=14)
+        for line in range(40):
+            words = ("".join(rng.choice("abcdefghij ") for _ in range(8)) for _ in range(8))
+            page.insert_text((72, 92 + 16 * line), " ".join(words), fontsize=10)
+    return [_array(page.get_pixmap(dpi=RENDER_DPI, colorspace=fitz.csGRAY)) for page in doc]
+
+
+def _rescan(image: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    im = Image.fromarray(image).rotate(rng.uniform(-0.8, 0.8), resample=Image.BILINEAR,
+                                       fillcolor=255)
+    dx, dy = rng.integers(-8, 9, 2)
+    im = im.transform(im.size, Image.AFFINE, (1, 0, dx, 0, 1, dy), fillcolor=255)
+    im = im.filter(ImageFilter.GaussianBlur(rng.uniform(0, 1.2)))
+    x = np.asarray(im, dtype=np.float32)
+    x = x * rng.uniform(0.85, 1.0) + rng.uniform(-10, 10) + rng.normal(0, rng.uniform(2, 8), x.shape)
+    return np.clip(x, 0, 255).astype(np.uint8)
+
+
+def _to_fingerprint_dpi(image: np.ndarray) -> np.ndarray:
+    scale = ocr.FINGERPRINT_DPI / RENDER_DPI
+    size = (int(image.shape[1] * scale), int(image.shape[0] * scale))
+    return np.asarray(Image.fromarray(image).resize(size, Image.BILINEAR))
+
+
+def bench(pdf_paths: list[str], scans: int, synthetic: int, thresholds: list[float], seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    renders = [_array(page.get_pixmap(dpi=RENDER_DPI, colorspace=fitz.csGRAY))
+               for path in pdf_paths for page in fitz.open(path)]
+    renders += _same_layout_pages(synthetic)
+    originals = [_to_fingerprint_dpi(image) for image in renders]
+    copies = [[_to_fingerprint_dpi(_rescan(image, rng)) for _ in range(scans)] for image in renders]
+    print(f"{len(renders)} pages ({synthetic} same-layout), {scans} rescans each")
+
+    def stats(image):
+        return ocr.ink_ratio(image), ocr.perceptual_hash(image)
+
+    def compare(a, b) -> tuple[float, bool]:
+        (ink_a, hash_a), (ink_b, hash_b) = a, b
+        ink_ok = abs(ink_a - ink_b) <= ocr.TRIAGE_DUP_INK_TOLERANCE * max(ink_a, ink_b)
+        return float(ocr.hash_distances(hash_a, hash_b)), ink_ok
+
+    original_stats = [stats(image) for image in originals]
+    copy_stats = [[stats(image) for image in page] for page in copies]
+    positives = [compare(original_stats[i], c) for i in range(len(renders)) for c in copy_stats[i]]
+    pairs = list(itertools.combinations(range(len(renders)), 2))
+    negatives = ([compare(original_stats[i], original_stats[j]) for i, j in pairs]
+                 + [compare(copy_stats[i][0], copy_stats[j][-1]) for i, j in pairs])
+
+    distances = np.array([d for d, _ in positives])
+    print(f"rescan distance: median {np.median(distances):.1f}, p90 {np.percentile(distances, 90):.1f}, "
+          f"max {distances.max():.1f}; closest different pages "
+          f"{min(d for d, _ in negatives):.1f}")
+    print(f"{'threshold':>9s} {'FN rate':>8s} {'FP rate':>8s} {'FP (hash only)':>14s}")
+    for t in thresholds:
+        fn = sum(not (d <= t and ink_ok) for d, ink_ok in positives) / len(positives)
+        fp = sum(d <= t and ink_ok for d, ink_ok in negatives) / len(negatives)
+        fp_hash = sum(d <= t for d, _ in negatives) / len(negatives)
+        mark = "  <- TRIAGE_DUP_MAX_DISTANCE" if t == ocr.TRIAGE_DUP_MAX_DISTANCE else ""
+        print(f"{t:9.1f} {fn:8.3f} {fp:8.4f} {fp_hash:14.4f}{mark}")
+    print(f"{len(positives)} rescan pairs, {len(negatives)} different-page pairs")
+
+
+if __name__ == "__main__":
+    default_pdfs = sorted(glob.glob(os.path.join(
+        os.path.dirname(__file__), "..", "test_data", "*.pdf")))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pdfs", nargs="*", default=default_pdfs)
+    ap.add_argument("--scans", type=int, default=4, help="simulated rescans per page")
+    ap.add_argument("--synthetic", type=int, default=12,
+                    help="extra pages sharing one letterhead and layout")
+    ap.add_argument("--thresholds", type=float, nargs="+",
+                    default=sorted({10, 15, ocr.TRIAGE_DUP_MAX_DISTANCE, 30, 40}))
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    bench(args.pdfs, args.scans, args.synthetic, args.thresholds, args.seed)
@@ -0,0 +1,98 @@
+"""Recall and latency of the HNSW local index against exact search.
+
+Uses synthetic clustered 384-dim vectors (MiniLM-sized) so no model is
+needed. Run from backend/:
+    python -m benchmarks.vector_ann [--sizes 100000 1000000] [--ef 16 32 64 128 256]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+import numpy as np
+from app.local_vector_store import HnswVectorIndex, LocalVectorIndex
+
+DIM = 384
+BATCH = 10000
+
+
+LATENT_DIM = 48
+# fixed projection so every batch shares the same embedding "space"
+PROJECTION = np.random.default_rng(42).normal(
+    size=(LATENT_DIM, DIM)).astype(np.float32)
+CENTERS = np.random.default_rng(43).normal(
+    size=(256, LATENT_DIM)).astype(np.float32)
+
+
+def synthetic_vectors(n: int, rng: np.random.Generator) -> np.ndarray:
+    # sentence embeddings have a low intrinsic dimension: clustered points in
+    # a 48-dim latent space projected to 384 dims, plus a little noise
+    labels = rng.integers(0, len(CENTERS), size=n)
+    latent = CENTERS[labels] + 0.7 * \
+        rng.normal(size=(n, LATENT_DIM)).astype(np.float32)
+    return latent @ PROJECTION + 0.1 * rng.normal(size=(n, DIM)).astype(np.float32)
+
+
+def metadata(i: int) -> dict:
+    # the shape build_vector_record stores, so reload parses realistic log lines
+    return {"topic-name": f"Topic {i}", "chunk-text": "Summary of the topic. " * 15,
+            "source": f"document-{i // 50}.pdf", "date": "2025-01-01"}
+
+
+def timed_queries(index, queries: np.ndarray, k: int) -> tuple[list[list[str]], list[float]]:
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        matches = index.query(vector=query, top_k=k)["matches"]
+        latencies.append(time.perf_counter() - start)
+        results.append([m["id"] for m in matches])
+    return results, latencies
+
+
+def percentile(values: list[float], p: float) -> float:
+    return float(np.percentile(values, p)) * 1000
+
+
+def bench(size: int, efs: list[int], n_queries: int, k: int) -> None:
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as root:
+        ann = HnswVectorIndex("bench", DIM, root=root)
+        start = time.perf_counter()
+        for offset in range(0, size, BATCH):
+            vectors = synthetic_vectors(min(BATCH, size - offset), rng)
+            ann.upsert(vectors=[{"id": str(offset + i), "values": v, "metadata": metadata(offset + i)}
+                                for i, v in enumerate(vectors)])
+        ann.flush()
+        ann.close()
+        build = time.perf_counter() - start
+
+        # an index directory is open in one instance at a time
+        exact = LocalVectorIndex("bench", DIM, root=root)
+        queries = synthetic_vectors(n_queries, rng)
+        truth, exact_lat = timed_queries(exact, queries, k)
+        exact.close()
+
+        start = time.perf_counter()
+        ann = HnswVectorIndex("bench", DIM, root=root)
+        reload = time.perf_counter() - start
+
+        print(f"\n{size} vectors: build {build:.1f}s, reload {reload:.2f}s")
+        print(f"{'search':>12s} {'recall@' + str(k):>10s} {'p50 ms':>8s} {'p95 ms':>8s}")
+        print(f"{'exact':>12s} {1.0:10.3f} {percentile(exact_lat, 50):8.2f} {percentile(exact_lat, 95):8.2f}")
+        for ef in efs:
+            ann.set_ef(ef)
+            found, lat = timed_queries(ann, queries, k)
+            recall = statistics.mean(len(set(f) & set(t)) / len(t)
+                                     for f, t in zip(found, truth))
+            print(f"{'hnsw ef=' + str(ef):>12s} {recall:10.3f} {percentile(lat, 50):8.2f} {percentile(lat, 95):8.2f}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    ap.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128, 256])
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("-k", type=int, default=6,
+                    help="top_k, get_vector_data uses 6")
+    args = ap.parse_args()
+    for size in args.sizes:
+        bench(size, args.ef, args.queries, args.k)